@@ -6,81 +6,30 @@
 import time
 import numpy as np
 
-from gridworld import GridWorld
-from value_iteration_agent import ValueIterationAgent
+from gridrl.gridworld import GridWorld
+from gridrl.value_iteration_agent import ValueIterationAgent
+from gridrl.sparse_mdp import SparseMDP
+from gridrl.policy_iteration_agent import PolicyIterationAgent
+from gridrl.render import print_value_table, print_terminal_heatmap
+from gridrl.scenarios import ScenarioBatch
 
 ENV_SIZE = 5
 GAMMA = 0.9
 THETA_THRESHOLD = 1e-9
 MAX_ITERATIONS = 10_000
-
-def print_value_table(V, title):
-    print(f"\n{title}")
-    for r in range(V.shape[0]):
-        print(" ".join(f"{V[r, c]:6.2f}" for c in range(V.shape[1])))
-
-def print_terminal_heatmap(V, title):
-    """
-    ANSI 256-color heatmap (no GUI). Uses grayscale background 232..255.
-    Also prints the numbers to the right of the color blocks.
-    """
-    vmin, vmax = float(np.min(V)), float(np.max(V))
-    span = vmax - vmin if vmax != vmin else 1.0
-
-    def code(x):
-        # map value to 232..255 (24 levels)
-        t = (x - vmin) / span
-        return 232 + int(round(t * 23))
-
-    print(f"\n{title} (terminal heatmap)")
-    # header for columns
-    print("    " + " ".join(f" c{j} " for j in range(V.shape[1])))
-    for i in range(V.shape[0]):
-        blocks = []
-        for j in range(V.shape[1]):
-            c = code(V[i, j])
-            blocks.append(f"\x1b[48;5;{c}m  \x1b[0m")  # two spaces with bg color
-        # append numeric values for readability
-        nums = " ".join(f"{V[i, j]:5.2f}" for j in range(V.shape[1]))
-        print(f"r{i}  " + "".join(blocks) + "   " + nums)
+MPI_K = 5     # evaluation sweeps per improvement in modified policy iteration
+SLIP = 0.1  # slippery variant: prob. of sliding perpendicular to the chosen move
+EDIT_CELL, EDIT_REWARD = (3, 4), -20.0  # tile edit for the incremental re-solve demo
+SWEEP_GAMMAS = [0.5, 0.9, 0.99]                              # scenario sweep: discounts ...
+SWEEP_SUBSTITUTIONS = [{}, {-5.0: -1.0}, {-5.0: -20.0, 10.0: 50.0}]  # ... x re-priced grey / goal tiles
 
 def run_value_iteration_batch(env, agent):
-    iters = 0
-    while iters < MAX_ITERATIONS:
-        V_old = agent.get_value_function()
-        new_V = np.copy(V_old)
-        for i in range(env.get_size()):
-            for j in range(env.get_size()):
-                if env.is_terminal_state(i, j):
-                    new_V[i, j] = 0.0
-                else:
-                    best_v, _, _ = agent.calculate_max_value(i, j)
-                    new_V[i, j] = best_v
-        if agent.is_done(new_V):
-            agent.update_value_function(new_V)
-            iters += 1
-            break
-        agent.update_value_function(new_V)
-        iters += 1
-    return iters
+    # Vectorized synchronous sweeps (same V*, policy and iteration count as the per-cell loop)
+    return agent.run_value_iteration_vectorized(MAX_ITERATIONS, terminal_value=0.0)
 
 def run_value_iteration_inplace(env, agent):
-    iters = 0
-    while iters < MAX_ITERATIONS:
-        delta = 0.0
-        for i in range(env.get_size()):
-            for j in range(env.get_size()):
-                old = agent.V[i, j]
-                if env.is_terminal_state(i, j):
-                    agent.V[i, j] = 0.0
-                else:
-                    best_v, _, _ = agent.calculate_max_value(i, j)
-                    agent.V[i, j] = best_v
-                delta = max(delta, abs(agent.V[i, j] - old))
-        iters += 1
-        if delta <= THETA_THRESHOLD:
-            break
-    return iters
+    # Row-major Gauss–Seidel sweeps (each backup sees values updated earlier in the sweep)
+    return agent.run_value_iteration_inplace(MAX_ITERATIONS, terminal_value=0.0)
 
 def main():
     env = GridWorld(ENV_SIZE)
@@ -93,6 +42,7 @@ def main():
     t_batch = (time.perf_counter() - t0) * 1000.0
     V_batch = agent.get_value_function()
     print_value_table(V_batch, f"Optimal Value Function (Batch) — {it_batch} iterations, {t_batch:.1f} ms")
+    print(f"[Batch] backups={agent.backups}")
     print_terminal_heatmap(V_batch, "VI (Batch) — V*")
     agent.update_greedy_policy()
     agent.print_policy()
@@ -105,16 +55,93 @@ def main():
     t_inplace = (time.perf_counter() - t0) * 1000.0
     V_inplace = agent.get_value_function()
     print_value_table(V_inplace, f"Optimal Value Function (In-place) — {it_inplace} iterations, {t_inplace:.1f} ms")
+    print(f"[In-place] backups={it_inplace * env.n_states}")
     print_terminal_heatmap(V_inplace, "VI (In-place) — V*")
     agent.update_greedy_policy()
     agent.print_policy()
 
-    # Sanity check
-    agent.update_value_function(np.zeros_like(agent.get_value_function()))
-    run_value_iteration_batch(env, agent); Vb = agent.get_value_function().copy()
+    # -------- Prioritized sweeping --------
+    print("\n=== Prioritized Sweeping (Asynchronous) Value Iteration ===")
     agent.update_value_function(np.zeros_like(agent.get_value_function()))
-    run_value_iteration_inplace(env, agent); Vi = agent.get_value_function().copy()
+    t0 = time.perf_counter()
+    n_backups = agent.run_value_iteration_prioritized()
+    t_prio = (time.perf_counter() - t0) * 1000.0
+    V_prio = agent.get_value_function()
+    print_value_table(V_prio, f"Optimal Value Function (Prioritized) — {n_backups} backups "
+                              f"(≈{n_backups / env.n_states:.1f} sweeps), {t_prio:.1f} ms")
+    agent.update_greedy_policy()
+    agent.print_policy()
+
+    # -------- Policy Iteration / Modified Policy Iteration --------
+    print("\n=== Policy Iteration (exact evaluation) ===")
+    pi_agent = PolicyIterationAgent(env, GAMMA, THETA_THRESHOLD)
+    t0 = time.perf_counter()
+    it_pi = pi_agent.run_policy_iteration()
+    t_pi = (time.perf_counter() - t0) * 1000.0
+    V_pi = pi_agent.get_value_function()
+    print_value_table(V_pi, f"Optimal Value Function (PI) — {it_pi} improvements, "
+                            f"{pi_agent.eval_sweeps} evaluation doublings, {t_pi:.1f} ms")
+    pi_agent.print_policy()
+
+    print(f"\n=== Modified Policy Iteration (k = {MPI_K}) ===")
+    mpi_agent = PolicyIterationAgent(env, GAMMA, THETA_THRESHOLD)
+    t0 = time.perf_counter()
+    it_mpi = mpi_agent.run_modified_policy_iteration(k=MPI_K)
+    t_mpi = (time.perf_counter() - t0) * 1000.0
+    V_mpi = mpi_agent.get_value_function()
+    print_value_table(V_mpi, f"Optimal Value Function (MPI) — {it_mpi} improvements, "
+                             f"{mpi_agent.eval_sweeps} sweeps, {t_mpi:.1f} ms")
+    mpi_agent.print_policy()
+
+    # Sanity check (compares the solutions kept above; no re-solve)
+    Vb, Vi = V_batch, V_inplace
     print(f"\nMax |V_batch - V_inplace| = {np.max(np.abs(Vb - Vi)):.3e}")
+    print(f"Max |V_batch - V_prioritized| = {np.max(np.abs(Vb - V_prio)):.3e}")
+    print(f"Max |V_batch - V_PI| = {np.max(np.abs(Vb - V_pi)):.3e}, "
+          f"Max |V_batch - V_MPI| = {np.max(np.abs(Vb - V_mpi)):.3e}")
+
+    # -------- Slippery GridWorld (sparse backend) --------
+    print(f"\n=== Sparse-Model Value Iteration (slip = {SLIP}) ===")
+    mdp = SparseMDP.from_gridworld(env, slip=SLIP)
+    agent.update_value_function(np.zeros_like(agent.get_value_function()))
+    t0 = time.perf_counter()
+    it_sparse = agent.run_value_iteration_sparse(mdp, MAX_ITERATIONS)
+    t_sparse = (time.perf_counter() - t0) * 1000.0
+    print_value_table(agent.get_value_function(),
+                      f"Optimal Value Function (Slippery) — {it_sparse} iterations, {t_sparse:.1f} ms, "
+                      f"nnz={mdp.nnz}, {mdp.nbytes / 1024:.1f} KiB")
+    agent.print_policy()
+
+    # -------- Incremental re-solve after a tile edit --------
+    print(f"\n=== Incremental Re-solve (tile {EDIT_CELL} reward → {EDIT_REWARD}) ===")
+    edit_env = GridWorld(ENV_SIZE)
+    inc_agent = ValueIterationAgent(edit_env, GAMMA, THETA_THRESHOLD)
+    inc_agent.update_value_function(Vb)  # previous solution of the unedited map
+    changed = edit_env.update_tiles([EDIT_CELL], reward=EDIT_REWARD)
+    t0 = time.perf_counter()
+    n_inc = inc_agent.run_value_iteration_incremental(changed)
+    t_inc = (time.perf_counter() - t0) * 1000.0
+    cold_agent = ValueIterationAgent(edit_env, GAMMA, THETA_THRESHOLD)
+    cold_agent.run_value_iteration_vectorized(MAX_ITERATIONS)
+    print_value_table(inc_agent.get_value_function(),
+                      f"Value Function after edit — {n_inc} backups (cold solve: {cold_agent.backups}), {t_inc:.1f} ms")
+    print(f"Max |V_incremental - V_cold| = "
+          f"{np.max(np.abs(inc_agent.get_value_function() - cold_agent.get_value_function())):.3e}")
+    inc_agent.update_greedy_policy()
+    inc_agent.print_policy()
+
+    # -------- Scenario sweep: gamma x reward variants in one batched solve --------
+    print(f"\n=== Scenario Sweep ({len(SWEEP_GAMMAS)} gammas x {len(SWEEP_SUBSTITUTIONS)} reward variants) ===")
+    batch = ScenarioBatch.from_grid(env, SWEEP_GAMMAS, SWEEP_SUBSTITUTIONS, THETA_THRESHOLD)
+    t0 = time.perf_counter()
+    batch.run_value_iteration(MAX_ITERATIONS)
+    t_batch_sweep = (time.perf_counter() - t0) * 1000.0
+    batch.update_greedy_policy()
+    print(f"{batch.n_scenarios} variants, {t_batch_sweep:.1f} ms")
+    for k, (gamma, subst) in enumerate(batch.labels):
+        first_move = env.action_description[batch.pi_idx[k][0, 0]]
+        print(f"  γ={gamma:<5} {str(subst or 'base map'):26s} sweeps={batch.sweeps[k]:<4d} "
+              f"V(0,0)={batch.V[k][0, 0]:7.3f}  first move {first_move}")
 
 if __name__ == "__main__":
     main()
@@ -4,11 +4,14 @@
 
 import time
 import random
+import tempfile
 import numpy as np
 
-from gridworld import GridWorld
-from value_iteration_agent import ValueIterationAgent
-from mc_agent import MCAgent
+from gridrl.gridworld import GridWorld
+from gridrl.value_iteration_agent import ValueIterationAgent
+from gridrl.mc_agent import MCAgent
+from gridrl.episode_store import EpisodeStore
+from gridrl.render import print_value_table, print_policy_arrows
 
 # ---------- Reproducibility ----------
 SEED = 42
@@ -22,83 +25,150 @@ EPS = 0.1
 MAX_STEPS = 200
 PRED_EPISODES = 5000
 CTRL_EPISODES = 30000
-ARROWS = ["→", "←", "↓", "↑"]  # Right=0, Left=1, Down=2, Up=3
-
-# ---------- Helpers ----------
-def print_value_table(V, title):
-    print(f"\n{title}")
-    for r in range(V.shape[0]):
-        print(" ".join(f"{V[r, c]:6.2f}" for c in range(V.shape[1])))
-
-def print_policy_arrows_from_indices(env, policy_idx, title):
-    print(f"\n{title}")
-    for i in range(env.get_size()):
-        row = []
-        for j in range(env.get_size()):
-            if env.is_terminal_state(i, j):
-                row.append(" G ")
-            else:
-                row.append(f" {ARROWS[policy_idx[i, j]]} ")
-        print("".join(row))
-
-# ---------- Build env + DP reference (with sync to agent V) ----------
-env = GridWorld(ENV_SIZE)
-dp = ValueIterationAgent(env, gamma=GAMMA, theta_threshold=1e-9)
-
-# Run batch value iteration to compute a DP reference V*
-V = np.zeros((ENV_SIZE, ENV_SIZE), dtype=float)
-for _ in range(10_000):
-    # IMPORTANT: sync the agent's internal V so calculate_max_value uses CURRENT V
-    dp.update_value_function(V)
-
-    Vn = V.copy()
-    for i in range(ENV_SIZE):
-        for j in range(ENV_SIZE):
-            if env.is_terminal_state(i, j):
-                Vn[i, j] = env.reward[i, j]   # keep terminal at +10
-            else:
-                best_v, _, _ = dp.calculate_max_value(i, j)  # max_a [ R(next)+gamma*V(next) ]
-                Vn[i, j] = best_v
-
-    if np.max(np.abs(Vn - V)) <= 1e-9:
-        V = Vn
-        break
-    V = Vn
-
-dp.update_value_function(V)
-dp.update_greedy_policy()
-
-print_value_table(V, "DP Optimal Value Function V* (reference)")
-print("\nDP Greedy Policy (arrows):")
-dp.print_policy()
-
-# ---------- MC Prediction (first-visit) : Always-Up baseline ----------
-mc = MCAgent(env, gamma=GAMMA, epsilon=EPS, max_steps=MAX_STEPS)
-
-t0 = time.perf_counter()
-# policy_idx=None => default baseline "Always Up" (action index 3) inside MCAgent
-V_pi = mc.mc_prediction_first_visit(episodes=PRED_EPISODES, policy_idx=None)
-t_pred_ms = (time.perf_counter() - t0) * 1000.0
-
-print_value_table(V_pi, f"\nMC Prediction V^π (Always Up), {PRED_EPISODES} episodes — {t_pred_ms:.1f} ms")
-print(f"[MC Prediction] episodes={PRED_EPISODES}, total steps={mc.steps_pred}, "
-      f"avg length={mc.steps_pred/max(1,PRED_EPISODES):.2f} steps/episode")
-
-# ---------- MC Control (epsilon-greedy) ----------
-t0 = time.perf_counter()
-V_star_mc, pi_mc = mc.mc_control_epsilon_greedy(episodes=CTRL_EPISODES)
-t_ctrl_ms = (time.perf_counter() - t0) * 1000.0
-
-print_value_table(V_star_mc, f"\nMC Control V* (approx), {CTRL_EPISODES} episodes — {t_ctrl_ms:.1f} ms")
-print(f"[MC Control] episodes={CTRL_EPISODES}, total steps={mc.steps_ctrl}, "
-      f"avg length={mc.steps_ctrl/max(1,CTRL_EPISODES):.2f} steps/episode")
-
-print_policy_arrows_from_indices(env, pi_mc, "MC Control Greedy Policy (arrows)")
-
-print("\nDP Greedy Policy (for visual comparison):")
-dp.print_policy()
-
-# ---------- Optional: quick numeric closeness summary ----------
-max_abs_diff = float(np.max(np.abs(V_star_mc - V)))
-mean_abs_diff = float(np.mean(np.abs(V_star_mc - V)))
-print(f"\n[Summary] MC-Control vs DP — max |V_mc - V_dp| = {max_abs_diff:.3f}, mean |V_mc - V_dp| = {mean_abs_diff:.3f}")
+BATCH_SIZE = 200  # parallel episodes per vectorized rollout batch
+N_WORKERS = 4     # processes for the pool-parallel MC runs
+SYNC_INTERVAL = 1000  # control episodes per round before workers pick up the new Q
+LOG_CHUNK = 1000      # episodes per chunk when replaying the on-disk episode log
+STOP_TOL = 0.5       # adaptive control: max 95% CI half-width of the greedy Q(s, a)
+STOP_PATIENCE = 5    # adaptive control: checkpoints (every SYNC_INTERVAL episodes) with an unchanged policy
+ROLLOUT_EPISODES = 20000  # single episodes timed for env.step + random vs the RolloutStream
+
+def main():
+    # ---------- Build env + DP reference (with sync to agent V) ----------
+    env = GridWorld(ENV_SIZE)
+    dp = ValueIterationAgent(env, gamma=GAMMA, theta_threshold=1e-9)
+
+    # Batch value iteration (vectorized sweeps) for the DP reference V*.
+    # Terminal kept at its landing reward (+10) for the MC comparison below.
+    ti, tj = env.terminal_state
+    dp.run_value_iteration_vectorized(max_iterations=10_000, terminal_value=env.reward[ti, tj])
+    dp.update_greedy_policy()
+    V = dp.get_value_function()
+
+    print_value_table(V, "DP Optimal Value Function V* (reference)")
+    print("\nDP Greedy Policy (arrows):")
+    dp.print_policy()
+
+    # ---------- MC Prediction (first-visit) : Always-Up baseline ----------
+    # Original sample stream (env.step + the seeded `random` module), as in solution.md
+    mc = MCAgent(env, gamma=GAMMA, epsilon=EPS, max_steps=MAX_STEPS, fast_rollouts=False)
+
+    t0 = time.perf_counter()
+    # policy_idx=None => default baseline "Always Up" (action index 3) inside MCAgent
+    V_pi = mc.mc_prediction_first_visit(episodes=PRED_EPISODES, policy_idx=None).copy()
+    t_pred_ms = (time.perf_counter() - t0) * 1000.0
+
+    print_value_table(V_pi, f"\nMC Prediction V^π (Always Up), {PRED_EPISODES} episodes — {t_pred_ms:.1f} ms")
+    print(f"[MC Prediction] episodes={PRED_EPISODES}, total steps={mc.steps_pred}, "
+          f"avg length={mc.steps_pred/max(1,PRED_EPISODES):.2f} steps/episode")
+
+    # ---------- MC Control (epsilon-greedy) ----------
+    t0 = time.perf_counter()
+    V_star_mc, pi_mc = mc.mc_control_epsilon_greedy(episodes=CTRL_EPISODES)
+    t_ctrl_ms = (time.perf_counter() - t0) * 1000.0
+
+    print_value_table(V_star_mc, f"\nMC Control V* (approx), {CTRL_EPISODES} episodes — {t_ctrl_ms:.1f} ms")
+    print(f"[MC Control] episodes={CTRL_EPISODES}, total steps={mc.steps_ctrl}, "
+          f"avg length={mc.steps_ctrl/max(1,CTRL_EPISODES):.2f} steps/episode")
+
+    print_policy_arrows(env, pi_mc, "MC Control Greedy Policy (arrows)")
+
+    print("\nDP Greedy Policy (for visual comparison):")
+    dp.print_policy()
+
+    # ---------- Optional: quick numeric closeness summary ----------
+    max_abs_diff = float(np.max(np.abs(V_star_mc - V)))
+    mean_abs_diff = float(np.mean(np.abs(V_star_mc - V)))
+    print(f"\n[Summary] MC-Control vs DP — max |V_mc - V_dp| = {max_abs_diff:.3f}, mean |V_mc - V_dp| = {mean_abs_diff:.3f}")
+
+    # ---------- Batched (vectorized) rollouts ----------
+    mc_batch = MCAgent(env, gamma=GAMMA, epsilon=EPS, max_steps=MAX_STEPS, seed=SEED)
+
+    t0 = time.perf_counter()
+    V_pi_b = mc_batch.mc_prediction_first_visit(episodes=PRED_EPISODES, batch_size=PRED_EPISODES).copy()
+    t_pred_b_ms = (time.perf_counter() - t0) * 1000.0
+    print(f"\n[Batched MC Prediction] episodes={PRED_EPISODES}, total steps={mc_batch.steps_pred} — "
+          f"{t_pred_b_ms:.1f} ms, max |V_batched - V_sequential| = {np.max(np.abs(V_pi_b - V_pi)):.3f}")
+
+    t0 = time.perf_counter()
+    V_ctrl_b, pi_ctrl_b = mc_batch.mc_control_epsilon_greedy(episodes=CTRL_EPISODES, batch_size=BATCH_SIZE)
+    t_ctrl_b_ms = (time.perf_counter() - t0) * 1000.0
+    print_value_table(V_ctrl_b, f"Batched MC Control V* (approx), {CTRL_EPISODES} episodes, "
+                                f"batch={BATCH_SIZE} — {t_ctrl_b_ms:.1f} ms")
+    print(f"[Batched MC Control] total steps={mc_batch.steps_ctrl}, "
+          f"max |V_mc - V_dp| = {np.max(np.abs(V_ctrl_b - V)):.3f}, mean |V_mc - V_dp| = {np.mean(np.abs(V_ctrl_b - V)):.3f}")
+    print_policy_arrows(env, pi_ctrl_b, "Batched MC Control Greedy Policy (arrows)")
+
+    # ---------- Process-pool parallel MC (seed streams spawned from SEED) ----------
+    mc_par = MCAgent(env, gamma=GAMMA, epsilon=EPS, max_steps=MAX_STEPS, seed=SEED)
+
+    t0 = time.perf_counter()
+    V_pi_p = mc_par.mc_prediction_first_visit(episodes=PRED_EPISODES, n_workers=N_WORKERS).copy()
+    t_pred_p_ms = (time.perf_counter() - t0) * 1000.0
+    print(f"\n[Parallel MC Prediction] workers={N_WORKERS}, steps={mc_par.steps_pred} — {t_pred_p_ms:.1f} ms, "
+          f"max |V_parallel - V_sequential| = {np.max(np.abs(V_pi_p - V_pi)):.3f}")
+
+    t0 = time.perf_counter()
+    V_ctrl_p, pi_ctrl_p = mc_par.mc_control_epsilon_greedy(episodes=CTRL_EPISODES, n_workers=N_WORKERS,
+                                                           sync_interval=SYNC_INTERVAL)
+    t_ctrl_p_ms = (time.perf_counter() - t0) * 1000.0
+    print(f"[Parallel MC Control] workers={N_WORKERS}, sync every {SYNC_INTERVAL} episodes, "
+          f"steps={mc_par.steps_ctrl} — {t_ctrl_p_ms:.1f} ms, "
+          f"max |V_mc - V_dp| = {np.max(np.abs(V_ctrl_p - V)):.3f}, mean |V_mc - V_dp| = {np.mean(np.abs(V_ctrl_p - V)):.3f}")
+    print_policy_arrows(env, pi_ctrl_p, "Parallel MC Control Greedy Policy (arrows)")
+
+    # ---------- Off-policy MC Control (weighted importance sampling) ----------
+    mc_off = MCAgent(env, gamma=GAMMA, epsilon=EPS, max_steps=MAX_STEPS, seed=SEED)
+    t0 = time.perf_counter()
+    V_off, pi_off = mc_off.mc_control_off_policy(episodes=CTRL_EPISODES)
+    t_off_ms = (time.perf_counter() - t0) * 1000.0
+    print_value_table(V_off, f"Off-policy MC Control V* (weighted IS), {CTRL_EPISODES} episodes — {t_off_ms:.1f} ms")
+    print(f"[Off-policy MC Control] total steps={mc_off.steps_ctrl}, "
+          f"max |V_mc - V_dp| = {np.max(np.abs(V_off - V)):.3f}, mean |V_mc - V_dp| = {np.mean(np.abs(V_off - V)):.3f}")
+    print_policy_arrows(env, pi_off, "Off-policy MC Control Greedy Policy (arrows)")
+
+    # ---------- Adaptive MC Control (early stop on stable policy + tight CIs) ----------
+    mc_stop = MCAgent(env, gamma=GAMMA, epsilon=EPS, max_steps=MAX_STEPS, seed=SEED)
+    t0 = time.perf_counter()
+    V_stop, pi_stop = mc_stop.mc_control_epsilon_greedy(episodes=CTRL_EPISODES, sync_interval=SYNC_INTERVAL,
+                                                        stop_tol=STOP_TOL, stop_patience=STOP_PATIENCE)
+    t_stop_ms = (time.perf_counter() - t0) * 1000.0
+    info = mc_stop.stop_info
+    print(f"\n[Adaptive MC Control] stopped after {info['episodes_used']} of {CTRL_EPISODES} episodes "
+          f"(saved {info['episodes_saved']}), CI half-width {info['max_half_width']:.3f} <= {STOP_TOL}, "
+          f"policy stable for {info['policy_stable_checks']} checks — {t_stop_ms:.1f} ms, "
+          f"max |V_mc - V_dp| = {np.max(np.abs(V_stop - V)):.3f}")
+    print_policy_arrows(env, pi_stop, "Adaptive MC Control Greedy Policy (arrows)")
+
+    # ---------- Episode log: record once, replay offline from memory-mapped chunks ----------
+    with tempfile.TemporaryDirectory() as log_dir, EpisodeStore(log_dir, env_size=ENV_SIZE) as store:
+        mc_log = MCAgent(env, gamma=GAMMA, epsilon=EPS, max_steps=MAX_STEPS, seed=SEED)
+        t0 = time.perf_counter()
+        n_logged = mc_log.record_episodes(store, PRED_EPISODES, batch_size=BATCH_SIZE)
+        t_rec_ms = (time.perf_counter() - t0) * 1000.0
+
+        t0 = time.perf_counter()
+        V_pi_log = mc_log.mc_prediction_first_visit(episodes=None, store=store, chunk_episodes=LOG_CHUNK).copy()
+        t_replay_ms = (time.perf_counter() - t0) * 1000.0
+        print(f"\n[Episode log] recorded {len(store)} episodes / {n_logged} steps — {t_rec_ms:.1f} ms; "
+              f"offline prediction in chunks of {LOG_CHUNK} — {t_replay_ms:.1f} ms, "
+              f"max |V_offline - V_sequential| = {np.max(np.abs(V_pi_log - V_pi)):.3f}")
+
+    # ---------- Single-episode rollouts: env.step + random vs RolloutStream ----------
+    # Same epsilon-greedy behavior (w.r.t. the learned Q) and episode distribution;
+    # the stream uses the compiled model, pre-drawn uniforms and cached greedy actions.
+    rates = {}
+    for fast, label in ((False, "env.step + random"), (True, "RolloutStream")):
+        mc_roll = MCAgent(env, gamma=GAMMA, epsilon=EPS, max_steps=MAX_STEPS, seed=SEED, fast_rollouts=fast)
+        mc_roll.Q[...] = mc.Q
+        mc_roll.refresh_rollouts()
+        t0 = time.perf_counter()
+        steps = sum(len(mc_roll.generate_episode(use_eps_greedy=True)) for _ in range(ROLLOUT_EPISODES))
+        t_roll = time.perf_counter() - t0
+        rates[fast] = steps / t_roll
+        print(f"{'' if fast else chr(10)}[Rollouts: {label}] {ROLLOUT_EPISODES} episodes, {steps} steps "
+              f"(avg length {steps / ROLLOUT_EPISODES:.2f}) — {t_roll * 1000.0:.1f} ms")
+    print(f"[Rollouts] RolloutStream speedup: {rates[True] / rates[False]:.1f}x steps/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# gridrl
+# GridWorld environment, dynamic-programming and Monte Carlo solvers for the CSCN8020 assignment.
+# Exports are resolved lazily (PEP 562), so `import gridrl` or the CLI does not pay for NumPy
+# or any solver module until one is actually used.
+
+import importlib
+
+_EXPORTS = {
+    "GridWorld": "gridworld",
+    "random_layout": "gridworld",
+    "ValueIterationAgent": "value_iteration_agent",
+    "PolicyIterationAgent": "policy_iteration_agent",
+    "SparseMDP": "sparse_mdp",
+    "MCAgent": "mc_agent",
+    "RolloutStream": "rollout",
+    "ScenarioBatch": "scenarios",
+    "EvalServer": "server",
+}
+
+__all__ = list(_EXPORTS)
+__version__ = "0.1.0"
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value  # cache: later lookups skip __getattr__
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,6 @@
+# python -m gridrl ... (same as the `gridrl` console script)
+
+from .cli import main
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,203 @@
+# benchmark.py
+# Reproducible benchmark of the DP and MC solvers over grid sizes, discounts and thresholds.
+# Records wall time, sweeps/episodes, backups (or steps) per second, peak traced memory and
+# error vs a tight DP reference, and writes machine-readable JSON and/or CSV.
+#
+#   gridrl bench --sizes 5 50 200 --gammas 0.9 0.99 --thetas 1e-6 1e-9 --json bench.json
+#   gridrl bench --map random --sizes 100 1000 --solvers vi_batch
+
+import argparse
+import csv
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from .gridworld import GridWorld, random_layout
+from .value_iteration_agent import ValueIterationAgent
+from .mc_agent import MCAgent
+from .solve_cache import SolveCache
+
+DEFAULT_SIZES = [5, 10, 50, 100, 500, 1000]
+DEFAULT_GAMMAS = [0.9, 0.99]
+DEFAULT_THETAS = [1e-6, 1e-9]
+REFERENCE_THETA = 1e-12
+SEED = 42
+
+CSV_FIELDS = ["solver", "size", "states", "gamma", "theta", "episodes", "sweeps", "backups",
+              "wall_s", "backups_per_s", "peak_mb", "max_err", "mean_err"]
+
+# ---------- Solvers ----------
+# Each solver(env, gamma, theta, opts) runs once and returns (V, sweeps, backups, episodes).
+# "backups" is Bellman backups for DP and environment steps for MC.
+def solve_vi_batch(env, gamma, theta, opts):
+    agent = ValueIterationAgent(env, gamma, theta)
+    sweeps = agent.run_value_iteration_vectorized()
+    return agent.V, sweeps, agent.backups, None
+
+def solve_vi_batch_f32(env, gamma, theta, opts):
+    # Compact mode; max_err against the float64 reference is its accuracy check
+    agent = ValueIterationAgent(env, gamma, theta, dtype=np.float32)
+    sweeps = agent.run_value_iteration_vectorized()
+    return agent.V, sweeps, agent.backups, None
+
+def solve_vi_inplace(env, gamma, theta, opts):
+    agent = ValueIterationAgent(env, gamma, theta)
+    sweeps = agent.run_value_iteration_inplace()
+    return agent.V, sweeps, agent.backups, None
+
+def solve_vi_multigrid(env, gamma, theta, opts):
+    agent = ValueIterationAgent(env, gamma, theta)
+    cost = agent.run_value_iteration_multigrid()  # fine-sweep equivalents across all levels
+    return agent.V, round(cost, 1), agent.backups, None
+
+def solve_mc_prediction(env, gamma, theta, opts):
+    mc = MCAgent(env, gamma=gamma, epsilon=opts.epsilon, max_steps=opts.max_steps, seed=SEED)
+    V = mc.mc_prediction_first_visit(opts.pred_episodes, batch_size=opts.batch_size or None)
+    return V, None, mc.steps_pred, opts.pred_episodes
+
+def solve_mc_control(env, gamma, theta, opts):
+    mc = MCAgent(env, gamma=gamma, epsilon=opts.epsilon, max_steps=opts.max_steps, seed=SEED)
+    V, _ = mc.mc_control_epsilon_greedy(opts.ctrl_episodes, batch_size=opts.batch_size or None)
+    return V, None, mc.steps_ctrl, opts.ctrl_episodes
+
+SOLVERS = {
+    "vi_batch": solve_vi_batch,
+    "vi_batch_f32": solve_vi_batch_f32,
+    "vi_inplace": solve_vi_inplace,
+    "vi_multigrid": solve_vi_multigrid,
+    "mc_prediction": solve_mc_prediction,
+    "mc_control": solve_mc_control,
+}
+THETA_FREE = {"mc_prediction", "mc_control"}  # run once per (size, gamma)
+EXPERIMENTAL = {"vi_multigrid"}  # no consistent gain over vi_batch; run only when named in --solvers
+
+# ---------- References ----------
+def reference_optimal(env, gamma, cache=None):
+    """Tight-theta V*; with a SolveCache it is solved once per map/gamma across benchmark runs."""
+    agent = ValueIterationAgent(env, gamma, REFERENCE_THETA)
+    if cache is None:
+        agent.run_value_iteration_vectorized()
+    else:
+        agent.run_value_iteration_cached(cache)
+    return agent.V.ravel()
+
+def reference_always_up(env, gamma, max_steps):
+    """V^π of the Always-Up baseline, truncated at max_steps like the MC episodes."""
+    s = np.arange(env.n_states)
+    nxt, rew = env.next_state[s, 3], env.reward_sa[s, 3]
+    live = ~env.done_sa[s, 3]
+    V = np.zeros(env.n_states)
+    for _ in range(max_steps):
+        V = rew + gamma * np.where(live, V[nxt], 0.0)
+    return V
+
+def errors(V, V_ref, env):
+    diff = np.abs(V.ravel() - V_ref)[~env.terminal_mask]  # terminal pinning differs per solver
+    return float(diff.max()), float(diff.mean())
+
+# ---------- Runner ----------
+def measure(fn, env, gamma, theta, opts):
+    best, result = float("inf"), None
+    for _ in range(opts.repeat):
+        t0 = time.perf_counter()
+        result = fn(env, gamma, theta, opts)
+        best = min(best, time.perf_counter() - t0)
+
+    peak_mb = None
+    if not opts.skip_memory:
+        tracemalloc.start()
+        fn(env, gamma, theta, opts)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result, best, peak_mb
+
+def make_env(size, opts):
+    """Default assignment map, or a seeded random map with walls/grey tiles (--map random)."""
+    if opts.map == "random":
+        codes = random_layout(size, opts.wall_density, opts.grey_density, opts.n_goals, seed=SEED)
+        return GridWorld.from_layout_codes(codes)
+    return GridWorld(size)
+
+def run(opts):
+    records = []
+    cache = SolveCache(opts.cache_dir) if opts.cache else None
+    for size in opts.sizes:
+        env = make_env(size, opts)
+        for gamma in opts.gammas:
+            V_star = reference_optimal(env, gamma, cache)
+            V_up = reference_always_up(env, gamma, opts.max_steps)
+            for name in opts.solvers:
+                if name == "vi_inplace" and size > opts.inplace_max_size:
+                    continue
+                thetas = [None] if name in THETA_FREE else opts.thetas
+                for theta in thetas:
+                    (V, sweeps, backups, episodes), wall, peak_mb = measure(
+                        SOLVERS[name], env, gamma, theta if theta is not None else REFERENCE_THETA, opts)
+                    max_err, mean_err = errors(V, V_up if name == "mc_prediction" else V_star, env)
+                    rec = dict(solver=name, size=size, states=env.n_states, gamma=gamma, theta=theta,
+                               episodes=episodes, sweeps=sweeps, backups=backups, wall_s=wall,
+                               backups_per_s=backups / wall if wall > 0 else None, peak_mb=peak_mb,
+                               max_err=max_err, mean_err=mean_err)
+                    records.append(rec)
+                    print(f"{name:14s} N={size:<5d} γ={gamma:<5} θ={theta!s:<6} "
+                          f"{wall * 1000.0:10.1f} ms  sweeps={sweeps!s:<5} "
+                          f"{rec['backups_per_s'] or 0:12.3e} backups/s  "
+                          f"peak={peak_mb if peak_mb is None else round(peak_mb, 1)} MB  max_err={max_err:.3e}")
+    return records
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return dict(commit=commit or None, python=platform.python_version(), numpy=np.__version__,
+                machine=platform.machine(), timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+def write_outputs(records, opts):
+    if opts.json:
+        with open(opts.json, "w") as f:
+            json.dump(dict(meta=metadata(), config=vars(opts), results=records), f, indent=2)
+    if opts.csv:
+        with open(opts.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark DP and MC solvers on GridWorld.")
+    p.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    p.add_argument("--gammas", type=float, nargs="+", default=DEFAULT_GAMMAS)
+    p.add_argument("--thetas", type=float, nargs="+", default=DEFAULT_THETAS)
+    p.add_argument("--map", choices=["default", "random"], default="default",
+                   help="assignment map or seeded random layout with walls and grey tiles")
+    p.add_argument("--wall-density", type=float, default=0.1)
+    p.add_argument("--grey-density", type=float, default=0.05)
+    p.add_argument("--n-goals", type=int, default=1)
+    p.add_argument("--solvers", nargs="+", choices=list(SOLVERS),
+                   default=[name for name in SOLVERS if name not in EXPERIMENTAL],
+                   help="default: all but the experimental vi_multigrid")
+    p.add_argument("--pred-episodes", type=int, default=5000)
+    p.add_argument("--ctrl-episodes", type=int, default=30000)
+    p.add_argument("--batch-size", type=int, default=200, help="MC rollout batch (0 = per-episode loop)")
+    p.add_argument("--epsilon", type=float, default=0.1)
+    p.add_argument("--max-steps", type=int, default=200)
+    p.add_argument("--inplace-max-size", type=int, default=50,
+                   help="skip per-cell in-place VI above this grid size")
+    p.add_argument("--repeat", type=int, default=1, help="timed runs per case (best is kept)")
+    p.add_argument("--cache", action="store_true", help="load / store the DP references in the solve cache")
+    p.add_argument("--cache-dir", default=None, help="solve cache directory (default $GRIDRL_CACHE_DIR or ~/.cache/gridrl)")
+    p.add_argument("--skip-memory", action="store_true", help="skip the extra tracemalloc run")
+    p.add_argument("--json", default="bench_results.json")
+    p.add_argument("--csv", default="bench_results.csv")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    opts = parse_args(argv)
+    write_outputs(run(opts), opts)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# checkpoint.py
+# Periodic, crash-safe checkpoints for long solver runs (batch VI sweeps, MC control).
+# Two slot directories alternate: a checkpoint writes its tables as .npy files into the
+# slot that is NOT current (through np.memmap, so big tables stream to disk without a
+# temporary copy), flushes them, and only then atomically replaces latest.json, which names
+# the slot and holds the small state (counters, RNG state, run parameters). An interrupted
+# write therefore leaves the previous checkpoint intact.
+#
+#   <dir>/latest.json        {"slot": 0|1, "kind": ..., "params": {...}, "state": {...}}
+#   <dir>/slot0/<name>.npy   tables of the checkpoint in slot 0 (V, Q, counts, ...)
+#
+#   ckpt = Checkpointer("runs/vi", every=50, resume=True)
+#   agent.run_value_iteration_vectorized(checkpoint=ckpt)   # picks up where it stopped
+
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+class Checkpointer:
+    def __init__(self, directory, every=100, every_seconds=None, resume=True):
+        """
+        every: checkpoint period in the solver's unit (sweeps for VI; episodes for MC,
+        taken at the next batch / round boundary). every_seconds additionally checkpoints
+        when that much wall time has passed. resume=False ignores (and later overwrites)
+        an existing checkpoint.
+        """
+        self.directory = directory
+        self.every = int(every)
+        self.every_seconds = every_seconds
+        self.resume = resume
+        os.makedirs(directory, exist_ok=True)
+        self.saves = 0
+        self._last_count = 0
+        self._last_time = time.monotonic()
+
+    def _latest_path(self):
+        return os.path.join(self.directory, "latest.json")
+
+    def _read_latest(self):
+        try:
+            with open(self._latest_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    # ---------- load ----------
+    def load(self, kind, params):
+        """
+        (arrays, state) of the last checkpoint for this kind of run, or None when there is
+        none or resume=False. Arrays are read-only memory maps. A checkpoint written with
+        different parameters is an error rather than silently mixed into this run.
+        """
+        latest = self._read_latest() if self.resume else None
+        if latest is None:
+            return None
+        if latest["kind"] != kind or latest["params"] != json.loads(json.dumps(params)):
+            raise ValueError(f"checkpoint in {self.directory} is for {latest['kind']} {latest['params']}, "
+                             f"not {kind} {params}")
+        slot = os.path.join(self.directory, f"slot{latest['slot']}")
+        arrays = {name: np.load(os.path.join(slot, f"{name}.npy"), mmap_mode="r") for name in latest["arrays"]}
+        self._last_count = latest["count"]
+        return arrays, latest["state"]
+
+    # ---------- save ----------
+    def due(self, count):
+        """True when `count` (sweeps / episodes so far) has advanced a period since the last save."""
+        if count - self._last_count >= self.every:
+            return True
+        return self.every_seconds is not None and time.monotonic() - self._last_time >= self.every_seconds
+
+    def save(self, kind, params, count, arrays, state):
+        """Write arrays (name -> ndarray) + JSON-able state as the new latest checkpoint."""
+        latest = self._read_latest()
+        slot_id = 1 - latest["slot"] if latest is not None else 0
+        slot = os.path.join(self.directory, f"slot{slot_id}")
+        os.makedirs(slot, exist_ok=True)
+        for name, arr in arrays.items():
+            arr = np.asarray(arr)
+            path = os.path.join(slot, f"{name}.npy")
+            if arr.size == 0:  # nothing to map
+                np.save(path, arr)
+                continue
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=arr.dtype, shape=arr.shape)
+            out[...] = arr
+            out.flush()
+            del out
+
+        record = dict(slot=slot_id, kind=kind, params=params, count=int(count), arrays=list(arrays), state=state)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(record, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._latest_path())  # the commit point
+        self.saves += 1
+        self._last_count = count
+        self._last_time = time.monotonic()
+
+    def clear(self):
+        try:
+            os.remove(self._latest_path())
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,353 @@
+# cli.py
+# Single entry point for the solvers:  gridrl {vi,pi,mc,scenarios,serve,bench} [options]
+# Only argparse/time are imported up front; NumPy and the solver modules load inside the
+# chosen command, and --timing reports that import cost next to build and solve time.
+#
+#   gridrl vi --size 5
+#   gridrl vi --map maps/big.npy --method sparse --slip 0.1 --timing
+#   gridrl vi --random --size 1000 --cache        # second run loads V* from the solve cache
+#   gridrl mc control --episodes 30000 --batch-size 200
+#   gridrl mc control --episodes 2000000 --checkpoint runs/ctrl   # rerun after a crash to resume
+#   gridrl mc record --store runs/up --episodes 100000 && gridrl mc prediction --store runs/up
+#   gridrl scenarios --gammas 0.9 0.99 --sub=-5:-10 --sub=10:20   # 6 variants in one batched solve
+#   gridrl serve --port 8765                      # JSON-lines evaluation server (gridrl.server)
+#   gridrl bench --sizes 5 50 --json bench.json
+
+import argparse
+import time
+
+PRINT_MAX_SIZE = 20  # above this size tables are downsampled, so min/max are printed too
+
+# ---------- Helpers ----------
+class Timer:
+    """Named wall-clock phases (import / build / solve), printed with --timing."""
+    def __init__(self):
+        self.phases = []
+        self._t0 = time.perf_counter()
+
+    def lap(self, name):
+        t = time.perf_counter()
+        self.phases.append((name, t - self._t0))
+        self._t0 = t
+
+    def report(self):
+        print("\nTiming: " + " | ".join(f"{name} {dt * 1000.0:.1f} ms" for name, dt in self.phases))
+
+def build_env(args):
+    from .gridworld import GridWorld, random_layout
+    if args.map is None and args.size < 2:
+        raise SystemExit(f"gridrl: --size must be at least 2, not {args.size}")
+    if args.map is not None:
+        if args.map.endswith(".npy"):
+            return GridWorld.from_npy(args.map, args.rewards)
+        return GridWorld.from_ascii(args.map)
+    if args.random:
+        return GridWorld.from_layout_codes(random_layout(args.size, seed=args.seed))
+    return GridWorld(args.size)
+
+def make_instrument(args):
+    if not args.profile:
+        return None
+    from .instrument import Instrumentation
+    return Instrumentation()
+
+def make_checkpoint(args):
+    if args.checkpoint is None:
+        return None
+    from .checkpoint import Checkpointer
+    return Checkpointer(args.checkpoint, every=args.checkpoint_every, resume=not args.no_resume)
+
+def print_summary(env, V, title):
+    """V table, block-averaged down to the terminal width on big grids."""
+    from .render import print_value_table
+    print_value_table(V, title)
+    if env.env_size > PRINT_MAX_SIZE:
+        print(f"{env.env_size}x{env.env_size}, min {V.min():.3f}, max {V.max():.3f}")
+
+def save_outputs(args, V, policy_idx=None):
+    if args.save:
+        from .render import save_npy
+        print("Saved " + ", ".join(save_npy(args.save, V, policy_idx)))
+
+# ---------- Commands ----------
+def cmd_vi(args, timer):
+    if args.cache and args.method != "batch":
+        raise SystemExit(f"gridrl vi: --cache only applies to --method batch, not {args.method}")
+    if args.checkpoint is not None and (args.method != "batch" or args.cache):
+        raise SystemExit("gridrl vi: --checkpoint only applies to --method batch without --cache")
+    from .value_iteration_agent import ValueIterationAgent
+    timer.lap("import")
+    env = build_env(args)
+    agent = ValueIterationAgent(env, args.gamma, args.theta, args.dtype)
+    agent.instrument = make_instrument(args)
+    mdp = None
+    if args.method == "sparse":
+        from .sparse_mdp import SparseMDP
+        mdp = SparseMDP.from_gridworld(env, args.slip)
+    timer.lap("build")
+
+    if args.method == "batch" and args.cache:
+        from .solve_cache import SolveCache
+        sweeps = agent.run_value_iteration_cached(SolveCache(args.cache_dir), args.max_iterations)
+    elif args.method == "batch":
+        sweeps = agent.run_value_iteration_vectorized(args.max_iterations, checkpoint=make_checkpoint(args))
+    elif args.method == "inplace":
+        sweeps = agent.run_value_iteration_inplace(args.max_iterations)
+    elif args.method == "multigrid":
+        sweeps = round(agent.run_value_iteration_multigrid(max_iterations=args.max_iterations), 1)
+        print("Levels (size, sweeps): " + ", ".join(f"{n}: {k}" for n, k in agent.level_sweeps))
+    elif args.method == "prioritized":
+        sweeps = None  # asynchronous backups, reported as sweep equivalents below
+        agent.run_value_iteration_prioritized()
+    else:
+        sweeps = agent.run_value_iteration_sparse(mdp, args.max_iterations)
+    if args.method != "sparse" and not args.cache:  # cached solves load the policy with V*
+        agent.update_greedy_policy()
+    timer.lap("solve")
+
+    if sweeps is None:
+        print(f"Value iteration ({args.method}): {agent.backups} backups "
+              f"(≈{agent.backups / env.n_states:.1f} sweeps)")
+    else:
+        print(f"Value iteration ({args.method}): sweeps={sweeps}, backups={agent.backups}")
+    print_summary(env, agent.V, "V*")
+    agent.print_policy()
+    save_outputs(args, agent.V, agent.pi_idx)
+    return agent
+
+def cmd_pi(args, timer):
+    from .policy_iteration_agent import PolicyIterationAgent
+    timer.lap("import")
+    env = build_env(args)
+    agent = PolicyIterationAgent(env, args.gamma, args.theta, args.dtype)
+    agent.instrument = make_instrument(args)
+    mdp = None
+    if args.slip > 0.0:
+        from .sparse_mdp import SparseMDP
+        mdp = SparseMDP.from_gridworld(env, args.slip)
+    timer.lap("build")
+
+    if args.k is None:
+        steps = agent.run_policy_iteration(mdp=mdp)
+    else:
+        steps = agent.run_modified_policy_iteration(args.k, mdp=mdp)
+    timer.lap("solve")
+
+    label = "Policy iteration" if args.k is None else f"Modified policy iteration (k={args.k})"
+    print(f"{label}: improvements={steps}, evaluation passes={agent.eval_sweeps}")
+    print_summary(env, agent.V, "V*")
+    agent.print_policy()
+    save_outputs(args, agent.V, agent.pi_idx)
+    return agent
+
+def cmd_mc(args, timer):
+    if args.checkpoint is not None and args.mode != "control":
+        raise SystemExit(f"gridrl mc: --checkpoint only applies to control, not {args.mode}")
+    from .mc_agent import MCAgent
+    timer.lap("import")
+    env = build_env(args)
+    mc = MCAgent(env, gamma=args.gamma, epsilon=args.epsilon, max_steps=args.max_steps, seed=args.seed,
+                 dtype=args.dtype)
+    mc.instrument = make_instrument(args)
+    timer.lap("build")
+
+    store = None
+    if args.store is not None:
+        from .episode_store import EpisodeStore
+        store = EpisodeStore(args.store, env_size=env.env_size)
+
+    try:
+        if args.mode == "record":
+            if store is None:
+                raise SystemExit("gridrl mc record: --store is required")
+            steps = mc.record_episodes(store, args.episodes, batch_size=args.batch_size or 500)
+            timer.lap("solve")
+            print(f"Recorded {args.episodes} episodes ({steps} steps) to {args.store}; log holds {len(store)}")
+            return
+        if args.mode == "prediction":
+            V = mc.mc_prediction_first_visit(None if store is not None else args.episodes,
+                                             batch_size=args.batch_size, n_workers=args.workers,
+                                             every_visit=args.every_visit, store=store)
+            steps = mc.steps_pred
+        elif args.mode == "control":
+            V, _ = mc.mc_control_epsilon_greedy(args.episodes, batch_size=args.batch_size,
+                                                n_workers=args.workers, every_visit=args.every_visit,
+                                                stop_tol=args.stop_tol, stop_patience=args.stop_patience,
+                                                checkpoint=make_checkpoint(args))
+            steps = mc.steps_ctrl
+            if args.stop_tol is not None:
+                print(f"Adaptive stop: {mc.stop_info}")
+        else:
+            V, _ = mc.mc_control_off_policy(args.episodes)
+            steps = mc.steps_ctrl
+        timer.lap("solve")
+
+        episodes = len(store) if store is not None and args.mode == "prediction" else args.episodes
+        if args.mode == "control":
+            episodes = mc.episodes_ctrl
+        print(f"MC {args.mode}: episodes={episodes}, steps={steps}")
+        print_summary(env, V, "V (MC)")
+        save_outputs(args, V, mc.policy if args.mode != "prediction" else None)
+        return mc
+    finally:
+        if store is not None:
+            store.close()  # flushes the columns, then the offsets that index them
+
+def parse_substitution(text):
+    """'-5:-10,10:20' -> {-5.0: -10.0, 10.0: 20.0}"""
+    return {float(old): float(new) for old, new in (pair.split(":") for pair in text.split(","))}
+
+def cmd_scenarios(args, timer):
+    from .scenarios import ScenarioBatch
+    timer.lap("import")
+    env = build_env(args)
+    gammas = args.gammas or [args.gamma]
+    batch = ScenarioBatch.from_grid(env, gammas, [{}] + [parse_substitution(s) for s in args.sub],
+                                    args.theta, args.dtype)
+    batch.instrument = make_instrument(args)
+    timer.lap("build")
+
+    batch.run_value_iteration(args.max_iterations, n_workers=args.workers)
+    batch.update_greedy_policy()
+    timer.lap("solve")
+
+    print(f"Scenario batch: {batch.n_scenarios} variants, backups={batch.backups}")
+    print(f"{'k':>3s}  {'gamma':>6s}  {'sweeps':>6s}  {'V(0,0)':>8s}  {'min V':>8s}  {'max V':>8s}  substitution")
+    for k, (gamma, subst) in enumerate(batch.labels):
+        V = batch.V[k]
+        print(f"{k:3d}  {gamma:6.3f}  {batch.sweeps[k]:6d}  {V[0, 0]:8.3f}  {V.min():8.3f}  {V.max():8.3f}  "
+              f"{subst or 'base map'}")
+    if args.save:
+        from .render import save_npy
+        print("Saved " + ", ".join(save_npy(args.save, batch.V, batch.pi_idx)))
+    return batch
+
+def cmd_serve(args, timer):
+    import asyncio
+    from .server import EvalServer
+    cache = None
+    if args.cache:
+        from .solve_cache import SolveCache
+        cache = SolveCache(args.cache_dir)
+
+    async def run():
+        server = await EvalServer(cache, args.max_tables, args.map_dir).start(args.host, args.port)
+        print(f"Serving on {args.host}:{server.port} (JSON lines: solve / lookup / unload / stats)", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()  # unlinks the shared-memory tables
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+def cmd_bench(args, timer):
+    from . import benchmark
+    benchmark.main(args.bench_args)
+
+# ---------- Parser ----------
+def add_checkpoint_args(p, unit, scope):
+    p.add_argument("--checkpoint", metavar="DIR", help=f"checkpoint the run to DIR and resume from it if present ({scope})")
+    p.add_argument("--checkpoint-every", type=int, default=100 if unit == "sweeps" else 10_000,
+                   help=f"{unit} between checkpoints")
+    p.add_argument("--no-resume", action="store_true", help="start over, ignoring an existing checkpoint")
+
+def add_env_args(p):
+    p.add_argument("--size", type=int, default=5, help="grid size N for the default or random map")
+    p.add_argument("--map", help="layout file: ASCII text, or .npy of legend codes (memory-mapped)")
+    p.add_argument("--rewards", help="optional per-tile reward .npy to go with a .npy --map")
+    p.add_argument("--random", action="store_true", help="seeded random map with walls and grey tiles")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--gamma", type=float, default=0.9)
+    p.add_argument("--dtype", choices=["float64", "float32"], default="float64",
+                   help="value/Q table precision; float32 also uses uint32 visit counts")
+    p.add_argument("--timing", action="store_true", help="print import/build/solve wall times")
+    p.add_argument("--profile", action="store_true",
+                   help="attach an Instrumentation: per-sweep residuals, backups/s, episode lengths, "
+                        "rollout vs update time")
+    p.add_argument("--save", metavar="PREFIX", help="write V (and the policy) to PREFIX.V.npy / PREFIX.pi.npy")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="gridrl", description="GridWorld DP and Monte Carlo solvers.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("vi", help="value iteration")
+    add_env_args(p)
+    p.add_argument("--method", choices=["batch", "inplace", "multigrid", "prioritized", "sparse"], default="batch",
+                   help="multigrid is experimental (same V*, no consistent gain over batch)")
+    p.add_argument("--theta", type=float, default=1e-9)
+    p.add_argument("--max-iterations", type=int, default=10_000)
+    p.add_argument("--slip", type=float, default=0.0, help="slip probability (sparse method only)")
+    p.add_argument("--cache", action="store_true", help="reuse/store the solution in the solve cache (batch only)")
+    p.add_argument("--cache-dir", default=None, help="solve cache directory (default $GRIDRL_CACHE_DIR or ~/.cache/gridrl)")
+    add_checkpoint_args(p, "sweeps", "batch method without --cache only")
+    p.set_defaults(func=cmd_vi)
+
+    p = sub.add_parser("pi", help="policy iteration (exact, or modified with --k)")
+    add_env_args(p)
+    p.add_argument("--theta", type=float, default=1e-9)
+    p.add_argument("--k", type=int, default=None, help="evaluation sweeps per improvement (modified PI)")
+    p.add_argument("--slip", type=float, default=0.0,
+                   help="slip probability; > 0 solves the slippery SparseMDP (iterative evaluation)")
+    p.set_defaults(func=cmd_pi)
+
+    p = sub.add_parser("mc", help="Monte Carlo prediction / control")
+    add_env_args(p)
+    p.add_argument("mode", choices=["prediction", "control", "off-policy", "record"])
+    p.add_argument("--episodes", type=int, default=30000)
+    p.add_argument("--epsilon", type=float, default=0.1)
+    p.add_argument("--max-steps", type=int, default=200)
+    p.add_argument("--batch-size", type=int, default=200, help="vectorized rollout batch (0 = per-episode loop)")
+    p.add_argument("--workers", type=int, default=None, help="process-pool workers")
+    p.add_argument("--every-visit", action="store_true")
+    p.add_argument("--stop-tol", type=float, default=None,
+                   help="control: stop early once the greedy policy is stable and Q CI half-widths <= this")
+    p.add_argument("--stop-patience", type=int, default=5, help="control: stable checkpoints required to stop")
+    p.add_argument("--store", help="episode log directory: 'record' appends Always-Up episodes to it, "
+                                   "'prediction' replays it instead of rolling out")
+    add_checkpoint_args(p, "episodes", "control only")
+    p.set_defaults(func=cmd_mc)
+
+    p = sub.add_parser("scenarios", help="batched VI over gamma x reward-substitution variants of one map")
+    add_env_args(p)
+    p.add_argument("--gammas", type=float, nargs="+", default=None, help="discounts to sweep (default --gamma)")
+    p.add_argument("--sub", action="append", default=[], metavar="OLD:NEW[,OLD:NEW]",
+                   help="reward substitution variant, e.g. --sub=-5:-10 re-prices grey tiles (repeatable; "
+                        "the unmodified map is always included)")
+    p.add_argument("--theta", type=float, default=1e-9)
+    p.add_argument("--max-iterations", type=int, default=10_000)
+    p.add_argument("--workers", type=int, default=None, help="split the variants over this many processes")
+    p.set_defaults(func=cmd_scenarios)
+
+    p = sub.add_parser("serve", help="asyncio evaluation server for solved V / policy tables")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--cache", action="store_true", help="solve through the solve cache")
+    p.add_argument("--cache-dir", default=None)
+    p.add_argument("--max-tables", type=int, default=64,
+                   help="solved tables kept in shared memory (least recently used evicted first)")
+    p.add_argument("--map-dir", default=None,
+                   help="directory that requests may name map / rewards files in (default: map files refused)")
+    p.set_defaults(func=cmd_serve)
+
+    # bench forwards every remaining option to the benchmark's own parser
+    p = sub.add_parser("bench", help="benchmark harness (options as in gridrl.benchmark)", add_help=False)
+    p.set_defaults(func=cmd_bench)
+
+    args, extra = parser.parse_known_args(argv)
+    if args.command != "bench" and extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.bench_args = extra
+    return args
+
+def main(argv=None):
+    timer = Timer()
+    args = parse_args(argv)
+    result = args.func(args, timer)
+    if getattr(args, "timing", False):
+        timer.report()
+    if result is not None and result.instrument is not None:
+        result.instrument.report()
+    return 0
@@ -0,0 +1,151 @@
+# episode_store.py
+# Append-only, columnar on-disk log of MC episodes. One raw binary file per column
+# (flat state index, action, landing reward) plus an offsets file holding each episode's
+# end position in the columns; everything is read back through np.memmap, so replaying
+# or auditing a long run touches only the chunk being processed.
+#
+#   <dir>/meta.json     env size and column dtypes
+#   <dir>/states.bin    int32   one entry per step
+#   <dir>/actions.bin   uint8
+#   <dir>/rewards.bin   float64
+#   <dir>/offsets.bin   int64   end offset of episode k (start = end of episode k-1)
+
+import json
+import os
+
+import numpy as np
+
+COLUMNS = {"states": np.int32, "actions": np.uint8, "rewards": np.float64}
+OFFSET_DTYPE = np.int64
+
+class EpisodeStore:
+    def __init__(self, directory, env_size=None):
+        """
+        Open (or create) a store. env_size is recorded on creation and checked on reopen,
+        so a log cannot be replayed against a different grid by mistake.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+            if env_size is not None and env_size != self.meta["env_size"]:
+                raise ValueError(f"store was written for env_size={self.meta['env_size']}, not {env_size}")
+        else:
+            if env_size is None:
+                raise ValueError("env_size is required to create a new episode store")
+            self.meta = dict(env_size=int(env_size),
+                             dtypes={name: np.dtype(dt).str for name, dt in COLUMNS.items()})
+            with open(meta_path, "w") as f:
+                json.dump(self.meta, f)
+
+        self._recover()
+        self._files = {name: open(self._path(name), "ab") for name in list(COLUMNS) + ["offsets"]}
+        self.n_episodes = self._file_len("offsets", OFFSET_DTYPE)
+        self.n_steps = int(self._read_offsets()[-1]) if self.n_episodes else 0
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def _file_len(self, name, dtype):
+        path = self._path(name)
+        return os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+
+    def _read_offsets(self):
+        return np.fromfile(self._path("offsets"), dtype=OFFSET_DTYPE)
+
+    def _recover(self):
+        """
+        Offsets are written after the columns have been flushed, so an interrupted append
+        leaves column tails past the last recorded episode (or a partial offset entry); cut
+        them off. Offsets pointing past the shortest column (a log written without that
+        ordering) are dropped too, so every recorded episode is complete.
+        """
+        n_off = self._file_len("offsets", OFFSET_DTYPE)
+        if n_off:
+            n_col = min(self._file_len(name, dt) for name, dt in COLUMNS.items())
+            n_off = int(np.searchsorted(self._read_offsets()[:n_off], n_col, side="right"))
+        if os.path.exists(self._path("offsets")):
+            os.truncate(self._path("offsets"), n_off * np.dtype(OFFSET_DTYPE).itemsize)
+        end = int(self._read_offsets()[-1]) if n_off else 0
+        for name, dt in COLUMNS.items():
+            if self._file_len(name, dt) > end:
+                os.truncate(self._path(name), end * np.dtype(dt).itemsize)
+
+    # ---------- writing ----------
+    def append(self, states, actions, rewards):
+        """Append one episode given as flat arrays of equal length."""
+        states = np.asarray(states)
+        self.append_batch(states[None, :], np.asarray(actions)[None, :], np.asarray(rewards)[None, :],
+                          np.array([states.size]))
+
+    def append_batch(self, states, actions, rewards, lengths):
+        """
+        Append padded (B, T) episode arrays with per-row lengths, the format yielded by
+        MCAgent.generate_episode_batches (and by iter_chunks).
+        """
+        lengths = np.asarray(lengths, dtype=np.int64)
+        valid = np.arange(states.shape[1])[None, :] < lengths[:, None]
+        for name, arr in (("states", states), ("actions", actions), ("rewards", rewards)):
+            self._files[name].write(np.ascontiguousarray(arr[valid], dtype=COLUMNS[name]).tobytes())
+            self._files[name].flush()  # column data reaches the OS before the offsets that cover it
+        ends = self.n_steps + np.cumsum(lengths)
+        self._files["offsets"].write(ends.astype(OFFSET_DTYPE).tobytes())
+        self.n_episodes += lengths.size
+        self.n_steps = int(ends[-1]) if lengths.size else self.n_steps
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n_episodes
+
+    # ---------- reading ----------
+    def columns(self):
+        """Memory-mapped (states, actions, rewards, end_offsets) over everything written so far."""
+        self.flush()
+        if self.n_episodes == 0:
+            return tuple(np.zeros(0, dtype=dt) for dt in list(COLUMNS.values()) + [OFFSET_DTYPE])
+        cols = [np.memmap(self._path(name), dtype=dt, mode="r", shape=(self.n_steps,))
+                for name, dt in COLUMNS.items()]
+        offsets = np.memmap(self._path("offsets"), dtype=OFFSET_DTYPE, mode="r", shape=(self.n_episodes,))
+        return (*cols, offsets)
+
+    def iter_chunks(self, chunk_episodes=1000, start=0, stop=None):
+        """
+        Yield episodes [start, stop) as padded (states, actions, rewards, lengths) chunks of
+        up to chunk_episodes episodes (int64 states/actions, zero-padded like the batched
+        rollouts). Only one chunk's slice of the columns is read into memory at a time.
+        """
+        states, actions, rewards, ends = self.columns()
+        stop = self.n_episodes if stop is None else min(stop, self.n_episodes)
+        for lo in range(start, stop, chunk_episodes):
+            hi = min(lo + chunk_episodes, stop)
+            first = int(ends[lo - 1]) if lo > 0 else 0
+            chunk_ends = np.asarray(ends[lo:hi]) - first
+            lengths = np.diff(chunk_ends, prepend=0)
+            starts = chunk_ends - lengths
+            last = int(chunk_ends[-1])
+
+            T = int(lengths.max())
+            valid = np.arange(T)[None, :] < lengths[:, None]
+            idx = (starts[:, None] + np.arange(T)[None, :])[valid]
+            out = []
+            for col, dt in ((states, np.int64), (actions, np.int64), (rewards, float)):
+                padded = np.zeros(valid.shape, dtype=dt)
+                padded[valid] = np.asarray(col[first:first + last])[idx]
+                out.append(padded)
+            yield (*out, lengths)
@@ -0,0 +1,299 @@
+# gridworld.py
+# 5x5 deterministic GridWorld used by Value Iteration and Monte Carlo.
+# Rewards (per the assignment): regular = -1, grey = -5 at (0,4),(2,2),(3,0), goal = +10 at (4,4);
+# GridWorld(N) without map arrays puts the goal at (N-1,N-1) and keeps the grey tiles that fit.
+# Larger maps (walls, several goals, per-tile rewards) load from ASCII or .npy layouts.
+# The dynamics are also compiled into flat (S, A) tables so solvers never re-run step() logic.
+
+import numpy as np
+
+# Layout legend: character → landing reward. '#' is a wall (cannot be entered),
+# 'G' a goal (terminal). The same byte codes are used for .npy layouts (uint8).
+DEFAULT_LEGEND = {".": -1.0, "g": -5.0, "G": +10.0, "#": 0.0}
+WALL_CHARS = "#"
+TERMINAL_CHARS = "G"
+
+class GridWorld:
+    def __init__(self, env_size=5, reward=None, terminal_mask=None, wall_mask=None):
+        """
+        Without map arrays: the assignment's map (goal in the bottom-right corner, grey
+        tiles, -1 elsewhere); other sizes keep the grey tiles that fit besides the goal.
+        Otherwise reward / terminal_mask / wall_mask are (env_size, env_size) arrays
+        describing the map (see from_ascii / from_npy).
+        """
+        self.env_size = env_size
+
+        # Action set: (dr, dc) in fixed order — Right, Left, Down, Up
+        self.actions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        self.action_description = ["Right", "Left", "Down", "Up"]
+
+        if reward is None:
+            # Terminal (goal) at bottom-right (0-indexed row, col): (4, 4) on the 5x5 map
+            terminal_state = (self.env_size - 1, self.env_size - 1)
+
+            # ----------------------------
+            # Reward map per ASSIGNMENT
+            # ----------------------------
+            # 1) Start with -1 everywhere (regular tiles)
+            self.reward = np.ones((self.env_size, self.env_size), dtype=float) * -1.0
+
+            # 2) Grey tiles (bigger penalty)
+            self.grey_states = [(r, c) for r, c in [(0, 4), (2, 2), (3, 0)]
+                                if r < self.env_size and c < self.env_size and (r, c) != terminal_state]
+            for (r, c) in self.grey_states:
+                self.reward[r, c] = -5.0
+
+            # 3) Goal gives +10 when you land on it
+            self.reward[terminal_state] = +10.0
+
+            terminal_mask = np.zeros((self.env_size, self.env_size), dtype=bool)
+            terminal_mask[terminal_state] = True
+        else:
+            self.reward = np.array(reward, dtype=float)
+            self.grey_states = []
+            if terminal_mask is None:
+                terminal_mask = np.zeros((self.env_size, self.env_size), dtype=bool)
+
+        shape = (self.env_size, self.env_size)
+        if wall_mask is None:
+            wall_mask = np.zeros(shape, dtype=bool)
+        if self.reward.shape != shape or np.shape(terminal_mask) != shape or np.shape(wall_mask) != shape:
+            raise ValueError(f"map arrays must all have shape {shape}")
+        self.terminal_grid = np.array(terminal_mask, dtype=bool)
+        self.wall_grid = np.array(wall_mask, dtype=bool)
+
+        # Goal cells; terminal_state keeps the first one for single-goal code
+        self.terminal_states = [(int(r), int(c)) for r, c in np.argwhere(self.terminal_grid)]
+        self.terminal_state = self.terminal_states[0] if self.terminal_states else None
+
+        # 4) Tabular model built once from the map above
+        self.compile_model()
+
+    # ---------- map loading ----------
+    @classmethod
+    def from_layout_codes(cls, codes, legend=None, reward=None):
+        """
+        Build from a square array of layout byte codes (ord of the legend characters).
+        All per-tile work is a lookup through a 256-entry table. An optional reward
+        array overrides the legend's per-character rewards tile by tile.
+        """
+        codes = np.asarray(codes, dtype=np.uint8)
+        if codes.ndim != 2 or codes.shape[0] != codes.shape[1]:
+            raise ValueError(f"layout must be a square 2-D grid, got shape {codes.shape}")
+        legend = DEFAULT_LEGEND if legend is None else legend
+
+        table = np.full(256, np.nan)
+        for ch, r in legend.items():
+            table[ord(ch)] = r
+        tile_reward = table[codes]
+        if np.isnan(tile_reward).any():
+            bad = sorted({chr(c) for c in np.unique(codes[np.isnan(tile_reward)])})
+            raise ValueError(f"layout uses characters missing from the legend: {bad}")
+
+        if reward is not None:
+            tile_reward = np.asarray(reward, dtype=float)
+        terminal_mask = np.isin(codes, np.frombuffer(TERMINAL_CHARS.encode(), dtype=np.uint8))
+        wall_mask = np.isin(codes, np.frombuffer(WALL_CHARS.encode(), dtype=np.uint8))
+        return cls(codes.shape[0], reward=tile_reward, terminal_mask=terminal_mask, wall_mask=wall_mask)
+
+    @classmethod
+    def from_ascii_text(cls, text, legend=None):
+        rows = [row for row in text.splitlines() if row.strip()]
+        if len({len(row) for row in rows}) != 1:
+            raise ValueError("all layout rows must have the same length")
+        codes = np.frombuffer("".join(rows).encode("ascii"), dtype=np.uint8).reshape(len(rows), -1)
+        return cls.from_layout_codes(codes, legend)
+
+    @classmethod
+    def from_ascii(cls, path, legend=None):
+        """ASCII map, one row per line, e.g. '..g#' / '...G' (see DEFAULT_LEGEND)."""
+        with open(path) as f:
+            return cls.from_ascii_text(f.read(), legend)
+
+    @classmethod
+    def from_npy(cls, layout_path, reward_path=None, legend=None, mmap=True):
+        """
+        .npy layout of uint8 legend codes (plus optional float .npy of per-tile rewards).
+        With mmap=True the files are memory-mapped, so huge maps are never copied whole
+        into RAM just to be read.
+        """
+        mode = "r" if mmap else None
+        codes = np.load(layout_path, mmap_mode=mode)
+        reward = np.load(reward_path, mmap_mode=mode) if reward_path is not None else None
+        return cls.from_layout_codes(codes, legend, reward)
+
+    def layout_codes(self):
+        """Inverse of from_layout_codes for walls/goals/regular tiles (rewards saved separately)."""
+        codes = np.full((self.env_size, self.env_size), ord("."), dtype=np.uint8)
+        codes[self.wall_grid] = ord(WALL_CHARS[0])
+        codes[self.terminal_grid] = ord(TERMINAL_CHARS[0])
+        return codes
+
+    def save_npy(self, layout_path, reward_path=None):
+        np.save(layout_path, self.layout_codes())
+        if reward_path is not None:
+            np.save(reward_path, self.reward)
+
+    # ---------- helpers ----------
+    def get_size(self):
+        return self.env_size
+
+    def in_bounds(self, i, j):
+        return 0 <= i < self.env_size and 0 <= j < self.env_size
+
+    def is_terminal_state(self, i, j):
+        return bool(self.terminal_grid[i, j])
+
+    def is_wall(self, i, j):
+        return bool(self.wall_grid[i, j])
+
+    def state_index(self, i, j):
+        """Flat state index s = i * N + j (row-major, same layout as V.ravel())."""
+        return i * self.env_size + j
+
+    def state_coords(self, s):
+        return divmod(int(s), self.env_size)
+
+    # ---------- compiled model ----------
+    def compile_model(self):
+        """
+        Build flat transition tables over S = N*N states and A actions:
+        - next_state[s, a] : int index of the landing state
+        - reward_sa[s, a]  : reward of the landing tile
+        - done_sa[s, a]    : True iff the landing tile is terminal
+        - terminal_mask[s] : True for terminal states (absorbing rows)
+        - wall_mask[s]     : True for walls (never entered; absorbing rows with reward 0)
+        - pred_indptr / pred_states : CSR index of predecessors, i.e. the non-absorbing
+          states s with next_state[s, a] == s' for some a are
+          pred_states[pred_indptr[s']:pred_indptr[s' + 1]]
+        Call again after editing self.reward, self.terminal_grid or self.wall_grid.
+        """
+        N = self.env_size
+        self.n_states = N * N
+        self.n_actions = len(self.actions)
+
+        s = np.arange(self.n_states)
+        rows, cols = np.divmod(s, N)
+        dr = np.array([a[0] for a in self.actions])
+        dc = np.array([a[1] for a in self.actions])
+
+        ni = rows[:, None] + dr[None, :]
+        nj = cols[:, None] + dc[None, :]
+        off_grid = (ni < 0) | (ni >= N) | (nj < 0) | (nj >= N)
+        next_state = np.where(off_grid, s[:, None], ni * N + nj)  # off-grid ⇒ stay
+
+        wall_mask = self.wall_grid.ravel()
+        next_state = np.where(wall_mask[next_state], s[:, None], next_state)  # bump into wall ⇒ stay
+
+        terminal_mask = self.terminal_grid.ravel().copy()
+        absorbing = terminal_mask | wall_mask
+        next_state[absorbing] = s[absorbing, None]  # absorbing goal (walls are never entered)
+
+        self.next_state = next_state
+        self.terminal_mask = terminal_mask
+        self.wall_mask = wall_mask.copy()
+        self.reward_sa = self.reward.ravel()[next_state]
+        self.done_sa = terminal_mask[next_state]
+        self.reward_sa[wall_mask] = 0.0
+        self.done_sa[wall_mask] = True
+
+        # Predecessor index (deduplicated (s', s) pairs sorted by s')
+        src = np.repeat(s, self.n_actions)
+        keep = ~absorbing[src]
+        pairs = np.sort(next_state.ravel()[keep].astype(np.int64) * self.n_states + src[keep])
+        pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]]  # sort + dedupe (faster than np.unique here)
+        self.pred_states = pairs % self.n_states
+        self.pred_indptr = np.zeros(self.n_states + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // self.n_states, minlength=self.n_states), out=self.pred_indptr[1:])
+
+    def update_tiles(self, cells, reward=None, terminal=None):
+        """
+        Change the landing reward and/or terminal flag of a few (i, j) cells in place and
+        patch the compiled model. Reward-only edits rewrite just the reward_sa rows of the
+        cells and their predecessors; a terminal flag change rebuilds the model since it
+        alters next_state. Returns the flat indices of the cells whose tile actually
+        changed (the input to ValueIterationAgent.run_value_iteration_incremental).
+        """
+        cells = np.atleast_2d(np.asarray(cells, dtype=np.int64))
+        rows, cols = cells[:, 0], cells[:, 1]
+        if np.any(self.wall_grid[rows, cols]):
+            raise ValueError("cannot update wall tiles")
+        old_reward = self.reward[rows, cols].copy()
+        old_terminal = self.terminal_grid[rows, cols].copy()
+
+        if reward is not None:
+            self.reward[rows, cols] = reward
+        if terminal is not None:
+            self.terminal_grid[rows, cols] = terminal
+        changed = (self.reward[rows, cols] != old_reward) | (self.terminal_grid[rows, cols] != old_terminal)
+        flat = np.unique(rows[changed] * self.env_size + cols[changed])
+
+        if np.any(self.terminal_grid[rows, cols] != old_terminal):
+            self.terminal_states = [(int(r), int(c)) for r, c in np.argwhere(self.terminal_grid)]
+            self.terminal_state = self.terminal_states[0] if self.terminal_states else None
+            self.compile_model()
+        elif flat.size:
+            preds = [self.pred_states[self.pred_indptr[s]:self.pred_indptr[s + 1]] for s in flat.tolist()]
+            touched = np.unique(np.concatenate([flat] + preds))
+            self.reward_sa[touched] = self.reward.ravel()[self.next_state[touched]]
+            self.reward_sa[touched[self.wall_mask[touched]]] = 0.0
+        return flat
+
+    def coarsen(self, factor=2, step_weight=1.0):
+        """
+        Aggregated map for coarse-to-fine solves: each factor x factor block becomes one tile
+        (the grid is padded with walls up to a multiple of factor). A block is a wall iff all
+        its cells are walls and terminal iff any cell is a goal (landing reward = best goal
+        reward); other blocks land with the mean reward of their open cells times step_weight,
+        the discounted cost of the ~factor fine steps one coarse move stands for.
+        """
+        N = self.env_size
+        M = -(-N // factor)
+        pad = M * factor - N
+
+        def blocks(a, fill):
+            a = np.pad(a, ((0, pad), (0, pad)), constant_values=fill)
+            return a.reshape(M, factor, M, factor).swapaxes(1, 2).reshape(M, M, factor * factor)
+
+        wall = blocks(self.wall_grid, True)
+        term = blocks(self.terminal_grid, False)
+        rew = blocks(self.reward, 0.0)
+
+        open_cells = ~wall & ~term
+        n_open = open_cells.sum(axis=-1)
+        mean_reward = (rew * open_cells).sum(axis=-1) / np.maximum(n_open, 1)
+        goal_reward = np.where(term, rew, -np.inf).max(axis=-1)
+
+        c_wall = wall.all(axis=-1)
+        c_term = term.any(axis=-1)
+        reward = np.where(c_term, goal_reward, step_weight * mean_reward)
+        reward[c_wall] = 0.0
+        return GridWorld(M, reward, c_term, c_wall)
+
+    # ---------- environment step ----------
+    def step(self, action_index, i, j):
+        """
+        Deterministic transition (served from the compiled model):
+        - From (i,j) take action actions[action_index].
+        - If off-grid, you stay in (i,j).
+        - Reward is for the landing tile.
+        - done=True iff landing tile is terminal (the goal itself is absorbing).
+        Returns: next_i, next_j, reward, done
+        """
+        s = i * self.env_size + j
+        ns = self.next_state[s, action_index]
+        ni, nj = divmod(int(ns), self.env_size)
+        return ni, nj, self.reward_sa[s, action_index], bool(self.done_sa[s, action_index])
+
+def random_layout(env_size, wall_density=0.1, grey_density=0.05, n_goals=1, seed=None):
+    """Random square layout (uint8 legend codes) for large-map runs and benchmarks."""
+    rng = np.random.default_rng(seed)
+    u = rng.random((env_size, env_size))
+    codes = np.full((env_size, env_size), ord("."), dtype=np.uint8)
+    codes[u < wall_density + grey_density] = ord("g")
+    codes[u < wall_density] = ord(WALL_CHARS[0])
+    free = np.flatnonzero(codes.ravel() != ord(WALL_CHARS[0]))
+    goals = rng.choice(free, size=min(n_goals, free.size), replace=False)
+    codes.ravel()[goals] = ord(TERMINAL_CHARS[0])
+    return codes
+
@@ -0,0 +1,125 @@
+# instrument.py
+# Opt-in instrumentation for the solvers and rollouts. Agents carry `instrument = None`;
+# the hot loops only test that attribute once per sweep / episode batch, so a disabled
+# run pays nothing measurable. Attach an Instrumentation to record:
+#   - per-sweep Bellman residual, sweep time and backups/sec (VI, sparse VI, PI/MPI)
+#   - MC episode-length histogram and the time split between rollout and update
+# and to call user callbacks on every event:  callback(event, info)  with event in
+# {"sweep", "batch"} and info a dict (keys listed on sweep() / batch()).
+#
+#   inst = Instrumentation(callbacks=[lambda ev, info: print(ev, info)])
+#   agent.instrument = inst; agent.run_value_iteration_vectorized(); inst.report()
+
+import time
+
+import numpy as np
+
+class Instrumentation:
+    def __init__(self, callbacks=(), record=True):
+        """record=False keeps only the callbacks (no per-event history is stored)."""
+        self.callbacks = list(callbacks)
+        self.record = record
+        self.reset()
+
+    def reset(self):
+        self.sweeps = []            # dicts: solver, sweep, residual, backups, seconds
+        self.batches = []           # dicts: kind, episodes, steps, rollout_s, update_s
+        self.length_hist = np.zeros(0, dtype=np.int64)  # episode count per length
+        self._t = time.perf_counter()
+
+    def add_callback(self, fn):
+        self.callbacks.append(fn)
+
+    def _emit(self, event, info):
+        for fn in self.callbacks:
+            fn(event, info)
+
+    # ---------- events (called by the agents) ----------
+    def start(self, solver):
+        """Mark the start of a solver run (resets the sweep clock)."""
+        self._t = time.perf_counter()
+
+    def sweep(self, solver, sweep, residual, backups):
+        """One full sweep: max |V_new - V_old| and the Bellman backups it performed."""
+        now = time.perf_counter()
+        info = dict(solver=solver, sweep=sweep, residual=float(residual), backups=int(backups),
+                    seconds=now - self._t)
+        self._t = now
+        if self.record:
+            self.sweeps.append(info)
+        self._emit("sweep", info)
+
+    def add_sweeps(self, infos):
+        """Sweep events recorded by another Instrumentation (pool workers), stored and emitted as-is."""
+        for info in infos:
+            if self.record:
+                self.sweeps.append(info)
+            self._emit("sweep", info)
+
+    def batch(self, kind, lengths, rollout_s, update_s, episodes=None, steps=None):
+        """
+        One batch of finished episodes: their lengths and rollout vs update wall time.
+        lengths=None (pool workers report totals only) takes episodes/steps instead and
+        leaves the length histogram untouched.
+        """
+        if lengths is not None:
+            lengths = np.asarray(lengths)
+            episodes, steps = lengths.size, lengths.sum()
+        info = dict(kind=kind, episodes=int(episodes), steps=int(steps), rollout_s=rollout_s, update_s=update_s)
+        if self.record:
+            self.batches.append(info)
+        if self.record and lengths is not None:
+            hist = np.bincount(lengths)
+            if hist.size > self.length_hist.size:
+                self.length_hist = np.pad(self.length_hist, (0, hist.size - self.length_hist.size))
+            self.length_hist[:hist.size] += hist
+        if self.callbacks:
+            self._emit("batch", dict(info, lengths=lengths))
+
+    def timed_batches(self, kind, batches):
+        """
+        Pass a rollout generator through, charging time inside the generator to rollout
+        and time spent by the consumer between items to update.
+        """
+        t = time.perf_counter()
+        for item in batches:
+            t_rolled = time.perf_counter()
+            yield item
+            t_updated = time.perf_counter()
+            self.batch(kind, item[-1], t_rolled - t, t_updated - t_rolled)
+            t = t_updated
+
+    # ---------- summaries ----------
+    def summary(self):
+        out = {}
+        by_solver = {}
+        for s in self.sweeps:
+            by_solver.setdefault(s["solver"], []).append(s)
+        for solver, rows in by_solver.items():
+            seconds = sum(r["seconds"] for r in rows)
+            backups = sum(r["backups"] for r in rows)
+            out[solver] = dict(sweeps=len(rows), final_residual=rows[-1]["residual"], seconds=seconds,
+                               backups=backups, backups_per_s=backups / seconds if seconds > 0 else None)
+        by_kind = {}
+        for b in self.batches:
+            by_kind.setdefault(b["kind"], []).append(b)
+        for kind, rows in by_kind.items():
+            steps = sum(r["steps"] for r in rows)
+            rollout = sum(r["rollout_s"] for r in rows)
+            update = sum(r["update_s"] for r in rows)
+            out[kind] = dict(batches=len(rows), episodes=sum(r["episodes"] for r in rows), steps=steps,
+                             rollout_s=rollout, update_s=update,
+                             steps_per_s=steps / (rollout + update) if rollout + update > 0 else None)
+        if self.length_hist.sum():
+            lengths = np.arange(self.length_hist.size)
+            cdf = np.cumsum(self.length_hist) / self.length_hist.sum()
+            out["episode_length"] = dict(mean=float((lengths * self.length_hist).sum() / self.length_hist.sum()),
+                                         p50=int(np.searchsorted(cdf, 0.5)), p90=int(np.searchsorted(cdf, 0.9)),
+                                         p99=int(np.searchsorted(cdf, 0.99)), max=int(lengths[self.length_hist > 0][-1]))
+        return out
+
+    def report(self):
+        print("\nInstrumentation:")
+        for name, row in self.summary().items():
+            print(f"  {name:16s} " + ", ".join(
+                f"{k}={v:.3g}" if isinstance(v, float) else f"{k}={v}" for k, v in row.items()))
@@ -0,0 +1,719 @@
+# mc_agent.py
+# Monte Carlo Prediction (first-visit) and Monte Carlo Control (epsilon-greedy)
+# Works with the shared GridWorld (rewards on landing; terminal at (4,4) on the default map).
+# concurrent.futures is imported only when a pool-parallel run is requested (keeps startup light).
+
+import numpy as np
+import random
+import time
+
+from .pool import env_pool, worker_env
+from .rollout import RolloutStream
+
+SLOT_ARRAYS = ("buf_s", "buf_a", "buf_r", "t_slot", "s", "live")  # resumable rollout-stream state
+
+# ---------------- Process-pool workers ----------------
+def _mc_worker(task):
+    """Roll out one shard of episodes; returns (returns_sum, returns_count, returns_sq, steps, rng_state)."""
+    params, rng_state, episodes, batch_size, Q, policy_idx, every_visit = task
+    agent = MCAgent(worker_env(), **params)
+    agent.rng.bit_generator.state = rng_state
+    if Q is not None:
+        agent.Q[...] = Q
+    g_sum, g_cnt, g_sq, steps = agent._shard_returns(episodes, batch_size, Q is not None, policy_idx, every_visit)
+    return g_sum, g_cnt, g_sq, steps, agent.rng.bit_generator.state
+
+class MCAgent:
+    def __init__(self, env, gamma=0.9, epsilon=0.1, max_steps=200, seed=None, dtype=np.float64,
+                 fast_rollouts=True):
+        """
+        dtype=np.float32 is the compact mode: float32 V/Q (and return variance) tables,
+        uint32 visit counts and int32 first-visit stamps, half the memory of the default.
+        Returns are still accumulated in float64 within each batch before being merged.
+        fast_rollouts=True plays single episodes through a RolloutStream (compiled model,
+        pre-drawn uniforms, cached greedy actions); False uses env.step and Python's `random`
+        per step (the original, slower sample stream). The stream draws from self.rng, or
+        with seed=None from a generator seeded off `random`, so random.seed reproduces it.
+        """
+        self.env = env
+        self.N = env.get_size()
+        self.gamma = float(gamma)
+        self.epsilon = float(epsilon)
+        self.max_steps = int(max_steps)
+
+        # State-value (prediction) and action-value (control) tables, and the dtypes of the
+        # per-key visit counts / first-visit stamps that go with them
+        self.dtype = np.dtype(dtype)
+        compact = self.dtype.itemsize < 8
+        self.count_dtype = np.dtype(np.uint32 if compact else np.int64)
+        self.stamp_dtype = np.dtype(np.int32 if compact else np.int64)
+        self.V = np.zeros((self.N, self.N), dtype=self.dtype)
+        self.Q = np.zeros((self.N, self.N, 4), dtype=self.dtype)  # actions: Right=0, Left=1, Down=2, Up=3
+        self.policy = np.zeros((self.N, self.N), dtype=int)  # greedy indices after control
+
+        # Operation counters (episodes_ctrl / stop_info: what the last control run used)
+        self.steps_pred = 0
+        self.steps_ctrl = 0
+        self.episodes_ctrl = 0
+        self.stop_info = {}
+
+        # NumPy generator for the batched (vectorized) rollouts;
+        # parallel workers get independent streams spawned from the same seed
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self._start_states = np.flatnonzero(~(env.terminal_mask | env.wall_mask))
+
+        # Single-episode rollout engine (built on first use) and the list form of the last
+        # fixed policy it followed
+        self.fast_rollouts = fast_rollouts
+        self._stream = None
+        self._q_version = 0       # bumped by the solvers on every Q update
+        self._greedy_version = -1  # Q version the stream's greedy cache reflects
+        self._policy_src = None
+        self._policy_list = None
+        self._cell_list = None  # (i, j) per flat state, for generate_episode
+
+        # Reusable episode buffers (flat state index, action, key s * A + a, landing reward,
+        # return), written by index: Python lists, since a store into one costs ~45 ns per
+        # element against ~230 ns for a NumPy scalar store. First-visit stamps:
+        # stamp[k] == episode number ⇒ k already credited this episode
+        self._ep_states = [0] * self.max_steps
+        self._ep_actions = [0] * self.max_steps
+        self._ep_keys = [0] * self.max_steps
+        self._ep_rewards = [0.0] * self.max_steps
+        self._ep_returns = [0.0] * self.max_steps
+        self._ep = (self._ep_states, self._ep_actions, self._ep_keys, self._ep_rewards)
+        self._stamp_V = np.full(env.n_states, -1, dtype=self.stamp_dtype)
+        self._stamp_Q = np.full(self.Q.size, -1, dtype=self.stamp_dtype)
+
+        # Optional Instrumentation (episode lengths, rollout/update time, callbacks); None = off
+        self.instrument = None
+
+    # ---------------- Helpers ----------------
+    def _random_start_state(self):
+        while True:
+            i = random.randrange(self.N)
+            j = random.randrange(self.N)
+            if not (self.env.is_terminal_state(i, j) or self.env.is_wall(i, j)):
+                return i, j
+
+    def _epsilon_greedy_action(self, i, j):
+        if random.random() < self.epsilon:
+            return random.randrange(4)
+        return int(np.argmax(self.Q[i, j, :]))
+
+    def _policy_action(self, i, j, policy_idx):
+        return int(policy_idx[i, j])
+
+    def refresh_rollouts(self):
+        """
+        Re-read the env model and the greedy actions of Q into the rollout stream. The
+        solvers keep the stream (or generate_episode) in step with their own Q updates;
+        call this after editing Q, a policy array or the env tiles by hand between
+        generate_episode calls.
+        """
+        if self._stream is None:
+            rng = self.rng if self.seed is not None else np.random.default_rng(random.getrandbits(64))
+            self._stream = RolloutStream(self.env, rng, self.epsilon, self.max_steps)
+        else:
+            self._stream.load_model()
+        self._stream.set_greedy(self.Q)
+        self._greedy_version = self._q_version
+        self._policy_src = None
+        return self._stream
+
+    def _stream_episode(self, use_eps_greedy, policy_idx):
+        """One episode from the rollout stream into the _ep_* buffers; returns its length."""
+        stream = self._stream if self._stream is not None else self.refresh_rollouts()
+        if stream.epsilon != self.epsilon:
+            stream.set_epsilon(self.epsilon)
+        if use_eps_greedy:
+            return stream.episode(self._ep)
+        return stream.episode(self._ep, self._flat_policy(policy_idx))
+
+    def _flat_policy(self, policy_idx):
+        """policy_idx as a flat list of actions (converted once per policy array)."""
+        if policy_idx is not self._policy_src:
+            self._policy_src = policy_idx
+            self._policy_list = np.asarray(policy_idx).ravel().tolist()
+        return self._policy_list
+
+    def _rollout_to_buffers(self, use_eps_greedy=False, policy_idx=None):
+        """
+        Play one episode (rewards on landing) into the preallocated _ep_* buffers: flat
+        state, action, key s * A + a and reward per step. Stops at terminal or max_steps.
+        Returns the episode length.
+        """
+        if self.fast_rollouts:
+            return self._stream_episode(use_eps_greedy, policy_idx)
+        states, actions, keys, rewards = self._ep
+        N, A, step, is_terminal = self.N, self.Q.shape[2], self.env.step, self.env.is_terminal_state
+        policy = None if use_eps_greedy else self._flat_policy(policy_idx)
+        s_i, s_j = self._random_start_state()
+        n = 0
+        while n < self.max_steps and not is_terminal(s_i, s_j):
+            s = s_i * N + s_j
+            a = self._epsilon_greedy_action(s_i, s_j) if policy is None else policy[s]
+            ni, nj, rew, done = step(a, s_i, s_j)
+            states[n] = s
+            actions[n] = a
+            keys[n] = s * A + a
+            rewards[n] = float(rew)
+            n += 1
+            s_i, s_j = ni, nj
+            if done:
+                break
+        return n
+
+    def generate_episode(self, use_eps_greedy=False, policy_idx=None):
+        """
+        Return a list of (state, action, reward) with rewards on landing.
+        Stops at terminal or max_steps. Epsilon-greedy follows epsilon and the Q of the last
+        solver run (see refresh_rollouts for hand edits).
+        """
+        if self.fast_rollouts and use_eps_greedy and self._greedy_version != self._q_version:
+            self.refresh_rollouts()  # a batched / pool run updated Q without the stream
+        n = self._rollout_to_buffers(use_eps_greedy, policy_idx)
+        states, actions, _, rewards = self._ep
+        return list(zip(map(self._cells().__getitem__, states[:n]), actions[:n], rewards[:n]))
+
+    def _credit_episode(self, table, counts, stamp, ep, keys, n, every_visit=False, alpha=None, m2=None):
+        """
+        Per-episode update of table[k] (V or flat Q) with the returns of the episode in the
+        _ep_* buffers, keys[:n] being its state or state-action keys.
+        First-visit credits the return from each key's first occurrence (stamp[k] == ep
+        marks keys already credited in episode ep); every_visit credits all occurrences.
+        Running mean via counts, or constant step alpha; m2 gets Welford's squared deviations.
+        """
+        gamma, rewards, returns = self.gamma, self._ep_rewards, self._ep_returns
+        G = 0.0
+        for t in range(n - 1, -1, -1):
+            G = gamma * G + rewards[t]
+            returns[t] = G
+        mean = alpha is None
+        # .item() reads give Python scalars, so the arithmetic stays out of NumPy
+        for t in range(n):  # forward, so the first visit is the one credited
+            k = keys[t]
+            if every_visit or stamp.item(k) != ep:
+                stamp[k] = ep
+                c = counts.item(k) + 1
+                counts[k] = c
+                q = table.item(k)
+                G = returns[t]
+                delta = G - q
+                table[k] = q + delta * (1.0 / c if mean else alpha)
+                if m2 is not None:  # Welford: uses the deviation before and after the update
+                    m2[k] += delta * (G - table.item(k))
+
+    def _cells(self):
+        """(i, j) tuple per flat state index, built once."""
+        if self._cell_list is None:
+            self._cell_list = [divmod(s, self.N) for s in range(self.env.n_states)]
+        return self._cell_list
+
+    # ---------------- Batched rollouts ----------------
+    def generate_episode_batches(self, episodes, n_envs, use_eps_greedy=False, policy_idx=None, slots=None):
+        """
+        Roll out `episodes` episodes through n_envs parallel slots on the env's compiled model.
+        Each step advances every running slot with one array expression; a slot whose episode
+        ends is refilled with a fresh random start, so the batch never idles on long episodes.
+        Yields (states, actions, rewards, lengths) every time n_envs episodes have finished:
+        (n, T) arrays of flat state indices / actions / landing rewards, zero-padded after
+        each episode's length. With use_eps_greedy the greedy actions are re-read from Q
+        after every yield, so the caller's Q updates take effect for the next chunk.
+        slots: optional dict kept updated at every yield with the in-flight episodes
+        (buffers, slot states, episodes launched); passing such a dict back in (e.g. from a
+        checkpoint, together with self.rng's state) continues the stream exactly.
+        """
+        env = self.env
+        S, T = env.n_states, self.max_steps
+        n_actions = self.Q.shape[2]
+        B = min(n_envs, episodes)
+
+        def base_actions():
+            if use_eps_greedy:
+                return np.argmax(self.Q.reshape(S, n_actions), axis=1)
+            return np.asarray(policy_idx).ravel()
+
+        greedy = base_actions()
+        if slots:  # resume the in-flight episodes of a checkpointed stream
+            buf_s, buf_a, buf_r, t_slot, s, live = (np.array(slots[k]) for k in SLOT_ARRAYS)
+            launched = int(slots["launched"])
+        else:
+            buf_s = np.zeros((B, T), dtype=np.int64)
+            buf_a = np.zeros((B, T), dtype=np.int64)
+            buf_r = np.zeros((B, T), dtype=float)
+            t_slot = np.zeros(B, dtype=np.int64)
+            s = self.rng.choice(self._start_states, size=B)
+            live = np.arange(B)
+            launched = B
+        finished = []
+
+        while live.size:
+            s_live, t_live = s[live], t_slot[live]
+            a = greedy[s_live]
+            if use_eps_greedy:
+                explore = self.rng.random(live.size) < self.epsilon
+                a = np.where(explore, self.rng.integers(n_actions, size=live.size), a)
+
+            buf_s[live, t_live] = s_live
+            buf_a[live, t_live] = a
+            buf_r[live, t_live] = env.reward_sa[s_live, a]
+            s[live] = env.next_state[s_live, a]
+            t_slot[live] += 1
+
+            ended = env.done_sa[s_live, a] | (t_live + 1 >= T)
+            if not ended.any():
+                continue
+            ended_slots = live[ended]
+            finished.append((buf_s[ended_slots], buf_a[ended_slots], buf_r[ended_slots], t_slot[ended_slots]))
+            buf_r[ended_slots] = 0.0  # padding must read as zero reward for the next episode
+
+            refill = ended_slots[:max(0, episodes - launched)]
+            s[refill] = self.rng.choice(self._start_states, size=refill.size)
+            t_slot[refill] = 0
+            launched += refill.size
+            if refill.size < ended_slots.size:
+                live = np.setdiff1d(live, ended_slots[refill.size:], assume_unique=True)
+
+            if sum(len(f[3]) for f in finished) >= B or live.size == 0:
+                states, actions, rewards, lengths = (np.concatenate(x) for x in zip(*finished))
+                T_used = int(lengths.max())
+                finished = []
+                if slots is not None:
+                    slots.update(zip(SLOT_ARRAYS, (buf_s, buf_a, buf_r, t_slot, s, live)), launched=launched)
+                yield states[:, :T_used], actions[:, :T_used], rewards[:, :T_used], lengths
+                greedy = base_actions()
+
+    def record_episodes(self, store, episodes, batch_size=500, use_eps_greedy=False, policy_idx=None):
+        """
+        Stream `episodes` batched rollouts into an EpisodeStore (append-only) instead of
+        discarding them, for later replay/auditing. Returns the number of steps written.
+        """
+        if policy_idx is None and not use_eps_greedy:
+            policy_idx = np.full((self.N, self.N), 3, dtype=int)  # Up = 3
+        steps = 0
+        for states, actions, rewards, lengths in self.generate_episode_batches(
+                episodes, batch_size, use_eps_greedy, policy_idx):
+            store.append_batch(states, actions, rewards, lengths)
+            steps += int(lengths.sum())
+        store.flush()
+        return steps
+
+    def _instrumented(self, kind, batches):
+        """Route a batch generator through the attached Instrumentation (unchanged if none)."""
+        return batches if self.instrument is None else self.instrument.timed_batches(kind, batches)
+
+    def _first_visit_batch(self, keys, rewards, lengths, n_keys, every_visit=False):
+        """
+        Discounted returns for a padded episode batch, reduced to one visit per key
+        (or all visits with every_visit=True).
+        keys[b, t] identifies what is being estimated (state, or state-action).
+        Returns (sum of credited returns, visit counts, sum of squared returns), each of
+        length n_keys; the squares feed the running variance of the adaptive control mode.
+        """
+        B, T = rewards.shape
+        G = np.zeros_like(rewards)
+        g = np.zeros(B)
+        for t in reversed(range(T)):
+            g = rewards[:, t] + self.gamma * g  # padding rewards are 0, so tails stay 0
+            G[:, t] = g
+
+        valid = np.arange(T)[None, :] < lengths[:, None]
+        if every_visit:
+            k, g = keys[valid], G[valid]
+            return (np.bincount(k, weights=g, minlength=n_keys), np.bincount(k, minlength=n_keys),
+                    np.bincount(k, weights=g * g, minlength=n_keys))
+
+        # First visit per (episode, key): np.unique's first index in time order
+        ep_key = (np.arange(B)[:, None] * n_keys + keys)[valid]
+        _, first = np.unique(ep_key, return_index=True)
+        k = keys[valid][first]
+        g_first = G[valid][first]
+        return (np.bincount(k, weights=g_first, minlength=n_keys), np.bincount(k, minlength=n_keys),
+                np.bincount(k, weights=g_first * g_first, minlength=n_keys))
+
+    def _shard_returns(self, episodes, batch_size, control, policy_idx=None, every_visit=False):
+        """
+        Batched rollouts reduced to mergeable statistics, without touching V/Q:
+        per-key sums, counts and squared sums of credited returns (keys = states, or
+        state*A+action for control), plus the number of steps taken.
+        """
+        S, A = self.env.n_states, self.Q.shape[2]
+        n_keys = S * A if control else S
+        g_sum = np.zeros(n_keys, dtype=float)
+        g_cnt = np.zeros(n_keys, dtype=np.int64)
+        g_sq = np.zeros(n_keys, dtype=float)
+        steps = 0
+        if episodes == 0:
+            return g_sum, g_cnt, g_sq, steps
+        for states, actions, rewards, lengths in self.generate_episode_batches(
+                episodes, batch_size, use_eps_greedy=control, policy_idx=policy_idx):
+            keys = states * A + actions if control else states
+            s_, c_, q_ = self._first_visit_batch(keys, rewards, lengths, n_keys, every_visit)
+            g_sum += s_
+            g_cnt += c_
+            g_sq += q_
+            steps += int(lengths.sum())
+        return g_sum, g_cnt, g_sq, steps
+
+    # ---------------- Parallel rollouts (process pool) ----------------
+    def _worker_rng_states(self, n_workers):
+        """One independent, reproducible stream per worker, spawned from self.seed."""
+        children = np.random.SeedSequence(self.seed).spawn(n_workers)
+        return [np.random.default_rng(c).bit_generator.state for c in children]
+
+    def _parallel_returns(self, pool, rng_states, episodes, batch_size, Q=None, policy_idx=None,
+                          every_visit=False):
+        """
+        Shard `episodes` over len(rng_states) workers and merge their statistics in worker
+        order (deterministic for a fixed seed and worker count). Advances rng_states in place.
+        """
+        n_workers = len(rng_states)
+        params = dict(gamma=self.gamma, epsilon=self.epsilon, max_steps=self.max_steps, dtype=self.dtype)
+        shards = [episodes // n_workers + (w < episodes % n_workers) for w in range(n_workers)]
+        tasks = [(params, rng_states[w], shards[w], batch_size, Q, policy_idx, every_visit)
+                 for w in range(n_workers)]
+
+        g_sum, g_cnt, g_sq, steps = 0.0, 0, 0.0, 0
+        for w, (s_, c_, q_, n_, state) in enumerate(pool.map(_mc_worker, tasks)):
+            g_sum = g_sum + s_
+            g_cnt = g_cnt + c_
+            g_sq = g_sq + q_
+            steps += n_
+            rng_states[w] = state
+        return g_sum, g_cnt, g_sq, steps
+
+    @staticmethod
+    def _merge_returns(table, counts, g_sum, g_cnt, g_sq=None, m2=None):
+        """
+        Fold a chunk's return sums/counts into a running mean table (flat views, in place).
+        With m2 given, also fold the chunk's squared sums into the running sum of squared
+        deviations (Chan et al. pairwise update), so variance = m2 / (counts - 1).
+        """
+        seen = g_cnt > 0
+        if m2 is not None:
+            n_a, n_b = counts[seen], g_cnt[seen]
+            mean_b = g_sum[seen] / n_b
+            m2_b = np.maximum(g_sq[seen] - n_b * mean_b * mean_b, 0.0)
+            delta = mean_b - table[seen]
+            m2[seen] += m2_b + delta * delta * n_a * n_b / (n_a + n_b)
+        counts[seen] += g_cnt[seen].astype(counts.dtype)  # uint32 counts in compact mode
+        table[seen] += (g_sum[seen] - g_cnt[seen] * table[seen]) / counts[seen]
+
+    # ------------- MC Prediction (first-visit) -------------
+    def mc_prediction_first_visit(self, episodes=5000, policy_idx=None, batch_size=None, n_workers=None,
+                                  alpha=None, every_visit=False, store=None, chunk_episodes=1000):
+        """
+        Estimate V^π for a deterministic policy π (given as indices).
+        If policy_idx is None, default to Problem-2 baseline: ALWAYS UP (action index 3).
+        V is kept as a running mean (V += (G - V) / n), or with constant step alpha if given
+        (per-episode path only), so no returns sums are stored.
+        every_visit=True averages the returns of all visits instead of one per episode.
+        With batch_size set, episodes are rolled out batch_size at a time as NumPy arrays.
+        With n_workers set, episodes are sharded over a process pool (batched rollouts in
+        each worker, default batch_size=500) and the return statistics are merged.
+        With store set (an EpisodeStore), no rollouts happen: the first `episodes` logged
+        episodes (all if None) are replayed chunk_episodes at a time from the memory-mapped
+        log, and policy_idx is ignored (the log already fixes the behavior).
+        """
+        self.steps_pred = 0
+        if policy_idx is None:
+            policy_idx = np.full((self.N, self.N), 3, dtype=int)  # Up = 3
+
+        returns_count = np.zeros(self.env.n_states, dtype=self.count_dtype)
+        self.V.fill(0.0)
+        V_flat = self.V.reshape(-1)
+
+        if store is not None:
+            for states, _, rewards, lengths in self._instrumented(
+                    "mc_prediction", store.iter_chunks(chunk_episodes, stop=episodes)):
+                self.steps_pred += int(lengths.sum())
+                g_sum, g_cnt, _ = self._first_visit_batch(states, rewards, lengths, self.env.n_states, every_visit)
+                self._merge_returns(V_flat, returns_count, g_sum, g_cnt)
+        elif n_workers:
+            with env_pool(n_workers, self.env) as pool:
+                t0 = time.perf_counter()
+                g_sum, g_cnt, _, self.steps_pred = self._parallel_returns(
+                    pool, self._worker_rng_states(n_workers), episodes, batch_size or 500,
+                    policy_idx=policy_idx, every_visit=every_visit)
+            t1 = time.perf_counter()
+            self._merge_returns(V_flat, returns_count, g_sum, g_cnt)
+            if self.instrument is not None:
+                self.instrument.batch("mc_prediction", None, t1 - t0, time.perf_counter() - t1,
+                                      episodes=episodes, steps=self.steps_pred)
+        elif batch_size:
+            for states, _, rewards, lengths in self._instrumented("mc_prediction", self.generate_episode_batches(
+                    episodes, batch_size, use_eps_greedy=False, policy_idx=policy_idx)):
+                self.steps_pred += int(lengths.sum())
+                g_sum, g_cnt, _ = self._first_visit_batch(states, rewards, lengths, self.env.n_states, every_visit)
+                self._merge_returns(V_flat, returns_count, g_sum, g_cnt)
+        else:
+            stamp = self._stamp_V
+            stamp.fill(-1)
+            inst = self.instrument
+            if self.fast_rollouts:
+                self.refresh_rollouts()
+            for ep in range(episodes):
+                if inst is not None:
+                    t0 = time.perf_counter()
+                n = self._rollout_to_buffers(use_eps_greedy=False, policy_idx=policy_idx)
+                if inst is not None:
+                    t1 = time.perf_counter()
+                self.steps_pred += n
+                self._credit_episode(V_flat, returns_count, stamp, ep, self._ep_states, n, every_visit, alpha)
+                if inst is not None:
+                    inst.batch("mc_prediction", [n], t1 - t0, time.perf_counter() - t1)
+
+        # Keep terminals consistent with env (reward on landing)
+        goals = self.env.terminal_grid
+        self.V[goals] = self.env.reward[goals]
+        return self.V
+
+    # ------------- MC Control (epsilon-greedy) -------------
+    def mc_control_epsilon_greedy(self, episodes=30000, batch_size=None, n_workers=None, sync_interval=1000,
+                                  alpha=None, every_visit=False, stop_tol=None, stop_patience=5, stop_z=1.96,
+                                  checkpoint=None):
+        """
+        Learn Q* with epsilon-greedy exploring starts, then return greedy policy and V from Q.
+        Q is a running mean of returns (or constant step alpha on the per-episode path);
+        only the visit counts are kept alongside it. every_visit=True credits every visit.
+        With batch_size set, batch_size episodes run side by side as NumPy arrays and Q is
+        refreshed every batch_size finished episodes (policy improvement per batch).
+        With n_workers set, each round of sync_interval episodes is sharded over a process
+        pool under the current Q; merged statistics update Q before the next round.
+
+        Adaptive mode (stop_tol set): `episodes` becomes a budget. A running variance of the
+        returns is kept per state-action, and at every checkpoint (each batch / pool round,
+        or every sync_interval episodes on the per-episode path) training stops once the
+        greedy policy has been unchanged for stop_patience checkpoints and every state's
+        greedy-action confidence half-width stop_z * sqrt(var / n) is at most stop_tol.
+        self.stop_info reports episodes used/saved and the final diagnostics.
+
+        checkpoint: a Checkpointer. Q, visit counts (and variances), counters and the RNG
+        state (self.rng and in-flight batched episodes, the worker streams, or the rollout
+        stream / Python's `random` on the per-episode path) are saved about every
+        checkpoint.every episodes and at the end; a run with the same settings resumes from
+        the last save and ends with exactly the Q of an uninterrupted run.
+        """
+        if stop_tol is not None and alpha is not None:
+            raise ValueError("adaptive stopping needs sample means; use it without alpha")
+        self.steps_ctrl = 0
+        self.Q.fill(0.0)
+        self._q_version += 1
+        self.policy.fill(0)
+        returns_count_Q = np.zeros(self.Q.size, dtype=self.count_dtype)
+        Q_flat = self.Q.reshape(-1)
+        A = self.Q.shape[2]
+
+        m2 = None if stop_tol is None else np.zeros(self.Q.size, dtype=self.dtype)
+        monitor = dict(prev=None, stable=0, half_width=np.inf, checks=0)
+
+        def converged():
+            """Checkpoint: update policy-stability / confidence diagnostics, True to stop."""
+            if m2 is None:
+                return False
+            live = self._start_states
+            greedy = np.argmax(self.Q.reshape(-1, A)[live], axis=1)
+            k = live * A + greedy
+            n = returns_count_Q[k]
+            half = np.where(n > 1, stop_z * np.sqrt(m2[k] / np.maximum(n - 1, 1) / np.maximum(n, 1)), np.inf)
+            same = monitor["prev"] is not None and np.array_equal(greedy, monitor["prev"])
+            monitor.update(prev=greedy, stable=monitor["stable"] + 1 if same else 0,
+                           half_width=float(half.max()), checks=monitor["checks"] + 1)
+            return monitor["stable"] >= stop_patience and monitor["half_width"] <= stop_tol
+
+        path = "pool" if n_workers else "batched" if batch_size else "episode"
+        used, rng_states, slots = 0, None, {}
+        resumed = None
+        if checkpoint is not None:
+            from .solve_cache import model_key
+            params = dict(model=model_key(self.env), path=path, episodes=episodes, batch_size=batch_size,
+                          n_workers=n_workers, sync_interval=sync_interval, alpha=alpha, every_visit=every_visit,
+                          stop_tol=stop_tol, stop_patience=stop_patience, stop_z=stop_z, gamma=self.gamma,
+                          epsilon=self.epsilon, max_steps=self.max_steps, seed=self.seed, dtype=self.dtype.str,
+                          fast_rollouts=self.fast_rollouts)
+            resumed = checkpoint.load("mc_control", params)
+
+        def save(done=False):
+            arrays = dict(Q=Q_flat, counts=returns_count_Q)
+            if m2 is not None:
+                arrays["m2"] = m2
+            state = dict(used=used, steps=self.steps_ctrl, done=done, rng=self.rng.bit_generator.state,
+                         monitor=dict(monitor, prev=None if monitor["prev"] is None else monitor["prev"].tolist()))
+            if path == "pool":
+                state["worker_rng"] = rng_states
+            elif path == "batched":
+                arrays.update((k, slots[k]) for k in SLOT_ARRAYS if k in slots)
+                state["launched"] = slots.get("launched")
+            elif self.fast_rollouts:
+                state["stream"] = self._stream.get_state()
+            else:
+                version, internal, gauss = random.getstate()
+                state["py_random"] = [version, list(internal), gauss]
+            if done:
+                state["stop_info"] = self.stop_info
+            checkpoint.save("mc_control", params, used, arrays, state)
+
+        if resumed is not None:
+            arrays, state = resumed
+            Q_flat[:] = arrays["Q"]
+            self._q_version += 1
+            returns_count_Q[:] = arrays["counts"]
+            if m2 is not None:
+                m2[:] = arrays["m2"]
+            used, self.steps_ctrl = state["used"], state["steps"]
+            self.rng.bit_generator.state = state["rng"]
+            monitor.update(state["monitor"])
+            if monitor["prev"] is not None:
+                monitor["prev"] = np.asarray(monitor["prev"])
+            if state["done"]:
+                self.episodes_ctrl, self.stop_info = used, state["stop_info"]
+                return self._greedy_from_Q()
+            if path == "pool":
+                rng_states = state["worker_rng"]
+            elif path == "batched":
+                slots = {k: arrays[k] for k in SLOT_ARRAYS}
+                slots["launched"] = state["launched"]
+            elif self.fast_rollouts:
+                self.refresh_rollouts().set_state(state["stream"])
+            else:
+                version, internal, gauss = state["py_random"]
+                random.setstate((version, tuple(internal), gauss))
+
+        if n_workers:
+            if rng_states is None:
+                rng_states = self._worker_rng_states(n_workers)
+            with env_pool(n_workers, self.env) as pool:
+                for start in range(used, episodes, sync_interval):
+                    t0 = time.perf_counter()
+                    n_round = min(sync_interval, episodes - start)
+                    g_sum, g_cnt, g_sq, steps = self._parallel_returns(
+                        pool, rng_states, n_round, batch_size or 200,
+                        Q=self.Q.copy(), every_visit=every_visit)
+                    t1 = time.perf_counter()
+                    self.steps_ctrl += steps
+                    used += n_round
+                    self._merge_returns(Q_flat, returns_count_Q, g_sum, g_cnt, g_sq, m2)
+                    self._q_version += 1
+                    if self.instrument is not None:
+                        self.instrument.batch("mc_control", None, t1 - t0, time.perf_counter() - t1,
+                                              episodes=n_round, steps=steps)
+                    if converged():
+                        break
+                    if checkpoint is not None and checkpoint.due(used):
+                        save()
+        elif batch_size:
+            if used < episodes:
+                batches = self.generate_episode_batches(episodes, batch_size, use_eps_greedy=True, slots=slots)
+                for states, actions, rewards, lengths in self._instrumented("mc_control", batches):
+                    self.steps_ctrl += int(lengths.sum())
+                    used += lengths.size
+                    g_sum, g_cnt, g_sq = self._first_visit_batch(states * A + actions, rewards, lengths,
+                                                                 self.Q.size, every_visit)
+                    self._merge_returns(Q_flat, returns_count_Q, g_sum, g_cnt, g_sq, m2)
+                    self._q_version += 1
+                    if converged():
+                        break
+                    if checkpoint is not None and checkpoint.due(used):
+                        save()
+        else:
+            stamp = self._stamp_Q
+            stamp.fill(-1)
+            inst = self.instrument
+            stream = None
+            if self.fast_rollouts:
+                stream = self._stream if resumed is not None else self.refresh_rollouts()
+            for ep in range(used, episodes):
+                if inst is not None:
+                    t0 = time.perf_counter()
+                n = self._rollout_to_buffers(use_eps_greedy=True)
+                if inst is not None:
+                    t1 = time.perf_counter()
+                self.steps_ctrl += n
+                self._credit_episode(Q_flat, returns_count_Q, stamp, ep, self._ep_keys, n, every_visit, alpha, m2)
+                self._q_version += 1
+                if stream is not None:
+                    stream.update_greedy(self.Q, self._ep_states[:n])
+                    self._greedy_version = self._q_version
+                if inst is not None:
+                    inst.batch("mc_control", [n], t1 - t0, time.perf_counter() - t1)
+                used = ep + 1
+                if m2 is not None and used % sync_interval == 0 and converged():
+                    break
+                if checkpoint is not None and checkpoint.due(used):
+                    save()
+
+        self.episodes_ctrl = used
+        self.stop_info = dict(episodes_used=used, episodes_saved=episodes - used,
+                              stopped_early=used < episodes, policy_stable_checks=monitor["stable"],
+                              max_half_width=monitor["half_width"], checks=monitor["checks"])
+        if checkpoint is not None:
+            save(done=True)
+        return self._greedy_from_Q()
+
+    def _greedy_from_Q(self):
+        """Greedy policy + V(s)=max_a Q(s,a); terminal gets policy -1 and its landing reward."""
+        term = self.env.terminal_grid
+        self.policy[:] = np.where(term, -1, np.argmax(self.Q, axis=2))
+        self.V[:] = np.where(term, self.env.reward, np.max(self.Q, axis=2))
+
+        return self.V, self.policy
+
+    # ------------- Off-policy MC Control (weighted importance sampling) -------------
+    def generate_behavior_episodes(self, episodes):
+        """
+        Yield episodes from the epsilon-greedy behavior policy w.r.t. the current Q as
+        (states, actions, rewards, behavior_probs) arrays (flat state indices), i.e. the
+        format mc_control_off_policy accepts as a log. Q updates made by the consumer are
+        picked up for the states of the episode just yielded.
+        """
+        A = self.Q.shape[2]
+        Q2 = self.Q.reshape(-1, A)
+        stream = self.refresh_rollouts() if self.fast_rollouts else None
+        for _ in range(episodes):
+            n = self._rollout_to_buffers(use_eps_greedy=True)
+            states, actions = np.array(self._ep_states[:n]), np.array(self._ep_actions[:n])
+            greedy = np.argmax(Q2[states], axis=1)  # Q is fixed during the rollout
+            probs = np.where(actions == greedy, 1.0 - self.epsilon + self.epsilon / A, self.epsilon / A)
+            yield states, actions, np.array(self._ep_rewards[:n]), probs
+            if stream is not None:  # the consumer may have updated Q along this episode
+                stream.update_greedy(self.Q, states)
+                self._greedy_version = self._q_version
+
+    def mc_control_off_policy(self, episodes=30000, episode_log=None):
+        """
+        Off-policy every-visit MC control with weighted importance sampling:
+        target = greedy w.r.t. Q, behavior = epsilon-greedy (probabilities given per step).
+        Incremental update with cumulative weights C (no returns lists):
+          C += W;  Q += (W / C) * (G - Q);  stop the episode once A_t ≠ argmax Q(S_t);
+          W /= b(A_t | S_t).
+        episode_log: iterable of (states, actions, rewards, behavior_probs) to learn from
+        instead of generating `episodes` fresh behavior episodes.
+        """
+        self.steps_ctrl = 0
+        self.Q.fill(0.0)
+        self._q_version += 1
+        self.policy.fill(0)
+        A = self.Q.shape[2]
+        Q_flat = self.Q.reshape(-1)
+        Q2 = self.Q.reshape(-1, A)
+        C = np.zeros(self.Q.size, dtype=self.dtype)
+
+        source = self.generate_behavior_episodes(episodes) if episode_log is None else episode_log
+        for states, actions, rewards, probs in source:
+            self.steps_ctrl += len(states)
+            G, W = 0.0, 1.0
+            for t in range(len(states) - 1, -1, -1):
+                s, a = states[t], actions[t]
+                G = self.gamma * G + rewards[t]
+                k = s * A + a
+                C[k] += W
+                Q_flat[k] += (W / C[k]) * (G - Q_flat[k])
+                if a != np.argmax(Q2[s]):
+                    break
+                W /= probs[t]
+            self._q_version += 1
+
+        return self._greedy_from_Q()
+
@@ -0,0 +1,204 @@
+# policy_iteration_agent.py
+# Policy Iteration (exact evaluation) and Modified Policy Iteration (k-step evaluation).
+# Shares the GridWorld compiled model and the greedy-policy/printing utilities of ValueIterationAgent.
+# Stochastic (slippery) models are passed as a SparseMDP (mdp=...); their policies are evaluated
+# iteratively to theta, since pointer doubling is only exact for deterministic moves.
+
+import numpy as np
+
+from .value_iteration_agent import ValueIterationAgent
+
+class PolicyIterationAgent(ValueIterationAgent):
+    def __init__(self, env, gamma=0.9, theta_threshold=1e-9, dtype=np.float64):
+        super().__init__(env, gamma, theta_threshold, dtype)
+
+        # Convergence counters of the last run (policy improvements / evaluation passes)
+        self.improvements = 0
+        self.eval_sweeps = 0
+
+    # ----- policy helpers -----
+    def _policy_model(self, pi):
+        """Per-state successor, discount and reward under a deterministic policy (flat arrays)."""
+        env = self.env
+        s = np.arange(env.n_states)
+        a = np.where(env.terminal_mask, 0, pi)
+        next_pi = env.next_state[s, a]
+        discount_pi = np.asarray(self.gamma * ~env.done_sa[s, a], dtype=self.dtype)
+        reward_pi = np.asarray(env.reward_sa[s, a], dtype=self.dtype)
+        return next_pi, discount_pi, reward_pi
+
+    def _sparse_policy_model(self, pi, mdp):
+        """
+        P_pi of a SparseMDP as CSR rows (the row of action pi[s] for every state), with
+        weights gamma * p folded in and terminal successors dropped, plus r_pi.
+        """
+        S = mdp.n_states
+        a_of = np.where(mdp.terminal_mask, 0, pi)
+        lengths = np.zeros(S, dtype=np.int64)
+        for a in range(mdp.n_actions):
+            rows = a_of == a
+            lengths[rows] = np.diff(mdp.indptr[a])[rows]
+        indptr = np.zeros(S + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=np.int64)
+        probs = np.empty(indptr[-1], dtype=float)
+        for a in range(mdp.n_actions):
+            rows = np.flatnonzero(a_of == a)
+            n = lengths[rows]
+            offset = np.repeat(indptr[rows], n)  # destination start of each copied entry's row
+            dst = offset + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+            src = dst - offset + np.repeat(mdp.indptr[a][rows], n)
+            indices[dst] = mdp.indices[a][src]
+            probs[dst] = mdp.probs[a][src]
+        weights = np.asarray(self.gamma * probs * ~mdp.terminal_mask[indices], dtype=self.dtype)
+        reward_pi = np.asarray(np.stack(mdp.expected_reward)[a_of, np.arange(S)], dtype=self.dtype)
+        return indptr, indices, weights, reward_pi
+
+    def _sparse_q_values(self, V_flat, mdp):
+        """Q(s,a) = r_a(s) + gamma * (P_a V)(s) on a SparseMDP, shape (S, A)."""
+        return np.stack(mdp.expected_reward, axis=1) + self.gamma * mdp.expected_next_value(V_flat)
+
+    def _improve(self, V_flat, pi, mdp=None):
+        """Greedy policy w.r.t. V; keeps the current action on exact ties so PI cannot cycle."""
+        Q = self.q_values(V_flat) if mdp is None else self._sparse_q_values(V_flat, mdp)
+        s = np.arange(self.env.n_states)
+        best = np.argmax(Q, axis=1)
+        keep = Q[s, np.maximum(pi, 0)] == Q[s, best]
+        new_pi = np.where(keep & (pi >= 0), pi, best)
+        new_pi[self.env.terminal_mask] = -1
+        return new_pi
+
+    # ----- policy evaluation -----
+    def evaluate_policy_exact(self, pi, terminal_value=0.0, mdp=None):
+        """
+        Solve V = r_pi + gamma * P_pi V exactly, for deterministic moves only (the GridWorld,
+        or a SparseMDP with one successor per state and action; a stochastic one raises
+        ValueError, see evaluate_policy_sparse). P_pi then maps each state to one successor,
+        so the solve is done by pointer doubling: after m doublings V holds the discounted
+        return of the first 2^m steps, and we stop once gamma^(2^m) underflows the tail.
+        Costs O(S log(1/(1-gamma))) instead of O(S / (1-gamma)) sweeps.
+        """
+        if mdp is None:
+            ptr, disc, V = self._policy_model(pi)
+        else:
+            indptr, ptr, disc, V = self._sparse_policy_model(pi, mdp)
+            if np.any(np.diff(indptr) != 1):
+                raise ValueError("exact evaluation needs deterministic moves; this SparseMDP is "
+                                 "stochastic (use evaluate_policy_sparse)")
+        V = V.copy()
+        for _ in range(64):  # 2^64 steps: more than enough for any gamma < 1
+            if disc.max() <= 1e-20:
+                break
+            V += disc * V[ptr]
+            disc = disc * disc[ptr]
+            ptr = ptr[ptr]
+            self.eval_sweeps += 1
+        V[self.env.terminal_mask] = terminal_value
+        return V
+
+    def evaluate_policy_sparse(self, pi, mdp, V_flat=None, terminal_value=0.0, max_sweeps=100_000):
+        """
+        Evaluate pi on a stochastic SparseMDP: synchronous sweeps of V <- r_pi + gamma * P_pi V
+        (one sparse mat-vec each) from V_flat (default 0) until V changes by at most theta.
+        Not exact: V is within about theta * gamma / (1 - gamma) of V_pi.
+        """
+        indptr, indices, weights, reward_pi = self._sparse_policy_model(pi, mdp)
+        theta = self.effective_theta()
+        V = np.zeros(mdp.n_states, dtype=self.dtype) if V_flat is None else np.array(V_flat, dtype=self.dtype)
+        V[mdp.terminal_mask] = terminal_value
+        for _ in range(max_sweeps):
+            V_new = reward_pi + np.add.reduceat(weights * V[indices], indptr[:-1])
+            V_new[mdp.terminal_mask] = terminal_value
+            self.eval_sweeps += 1
+            residual = np.max(np.abs(V_new - V))
+            V = V_new
+            if residual <= theta:
+                break
+        return V
+
+    def evaluate_policy_k_steps(self, pi, V_flat, k, terminal_value=0.0, mdp=None):
+        """k synchronous sweeps of V <- r_pi + gamma * P_pi V starting from V_flat."""
+        V = V_flat.copy()
+        if mdp is None:
+            next_pi, discount_pi, reward_pi = self._policy_model(pi)
+            for _ in range(k):
+                V = reward_pi + discount_pi * V[next_pi]
+                V[self.env.terminal_mask] = terminal_value
+        else:
+            indptr, indices, weights, reward_pi = self._sparse_policy_model(pi, mdp)
+            for _ in range(k):
+                V = reward_pi + np.add.reduceat(weights * V[indices], indptr[:-1])
+                V[mdp.terminal_mask] = terminal_value
+        self.eval_sweeps += k
+        return V
+
+    # ----- solvers -----
+    def run_policy_iteration(self, max_iterations=1_000, terminal_value=0.0, mdp=None):
+        """
+        Howard's policy iteration: exact evaluation, greedy improvement, until the policy
+        is stable. Starts from the current pi_idx. Returns the number of improvement steps.
+        With a stochastic SparseMDP as mdp, each evaluation runs evaluate_policy_sparse,
+        warm-started from the previous policy's V.
+        """
+        pi = self.pi_idx.ravel().copy()
+        pi[self.env.terminal_mask] = -1
+        self.improvements, self.eval_sweeps = 0, 0
+        inst = self.instrument
+        if inst is not None:
+            inst.start("pi")
+        V = V_prev = None
+
+        while self.improvements < max_iterations:
+            evals = self.eval_sweeps
+            if mdp is None:
+                V = self.evaluate_policy_exact(pi, terminal_value)
+            else:
+                V = self.evaluate_policy_sparse(pi, mdp, V, terminal_value)
+            new_pi = self._improve(V, pi, mdp)
+            self.improvements += 1
+            if inst is not None:  # one event per improvement; residual = change of V_pi
+                residual = np.inf if V_prev is None else np.max(np.abs(V - V_prev))
+                inst.sweep("pi", self.improvements, residual, (self.eval_sweeps - evals + 1) * self.env.n_states)
+                V_prev = V
+            if np.array_equal(new_pi, pi):
+                break
+            pi = new_pi
+
+        self.V = V.reshape(self.env_size, self.env_size)
+        self.pi_idx = pi.reshape(self.env_size, self.env_size)
+        self.backups = (self.improvements + self.eval_sweeps) * self.env.n_states
+        return self.improvements
+
+    def run_modified_policy_iteration(self, k=5, max_iterations=10_000, terminal_value=0.0, mdp=None):
+        """
+        Modified policy iteration: greedy improvement followed by k evaluation sweeps.
+        k=0 is value iteration, k→∞ is policy iteration. Stops when one greedy backup
+        changes V by at most theta. Returns the number of improvement steps.
+        mdp: optional (stochastic) SparseMDP to solve instead of the deterministic env.
+        """
+        V = np.array(self.V, dtype=self.dtype).ravel()
+        V[self.env.terminal_mask] = terminal_value
+        theta = self.effective_theta()
+        pi = np.full(self.env.n_states, -1)
+        self.improvements, self.eval_sweeps = 0, 0
+        inst = self.instrument
+        if inst is not None:
+            inst.start("mpi")
+
+        while self.improvements < max_iterations:
+            pi = self._improve(V, pi, mdp)
+            V_greedy = self.evaluate_policy_k_steps(pi, V, 1, terminal_value, mdp)
+            self.improvements += 1
+            residual = np.max(np.abs(V_greedy - V))
+            converged = residual <= theta
+            if inst is not None:  # one event per improvement: greedy backup + k evaluation sweeps
+                inst.sweep("mpi", self.improvements, residual, (1 + (0 if converged else k)) * self.env.n_states)
+            V = V_greedy
+            if converged:
+                break
+            V = self.evaluate_policy_k_steps(pi, V, k, terminal_value, mdp)
+
+        self.V = V.reshape(self.env_size, self.env_size)
+        self.pi_idx = pi.reshape(self.env_size, self.env_size)
+        self.backups = self.eval_sweeps * self.env.n_states
+        return self.improvements
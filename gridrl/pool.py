@@ -0,0 +1,21 @@
+# pool.py
+# Process-pool plumbing shared by the parallel solvers (MC rollouts, scenario batches).
+# The pool initializer ships the environment to each worker once; task functions read it
+# back with worker_env() instead of receiving a pickled copy with every task.
+# concurrent.futures is imported only when a pool is actually created.
+
+_worker_env = None
+
+def init_worker(env):
+    """Pool initializer: ship the environment to each worker once."""
+    global _worker_env
+    _worker_env = env
+
+def worker_env():
+    """The environment shipped to this worker process by init_worker."""
+    return _worker_env
+
+def env_pool(n_workers, env):
+    """ProcessPoolExecutor whose workers all hold env."""
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(n_workers, initializer=init_worker, initargs=(env,))
@@ -0,0 +1,106 @@
+# render.py
+# Text output for value tables, greedy-policy arrows and ANSI heatmaps, plus .npy export
+# of V and the policy. Every frame is assembled into one string (one %-format per row, a
+# lookup table for the heatmap blocks) and written with a single call. Grids wider than
+# the terminal are block-downsampled first: values show the block mean, arrows the
+# block's top-left cell, with 'G' if the block holds a goal and '#' if it is all wall.
+
+import shutil
+import sys
+
+import numpy as np
+
+ARROWS = np.array(["→", "←", "↓", "↑"])  # matches env.actions order
+HEAT_BLOCKS = np.array([f"\x1b[48;5;{c}m  \x1b[0m" for c in range(232, 256)])  # 24 grey levels
+
+def terminal_width(fallback=80):
+    return shutil.get_terminal_size((fallback, 24)).columns
+
+def block_factor(n, cell_width, reserve=0, max_width=None):
+    """Smallest block size f such that ceil(n / f) cells of cell_width fit the width."""
+    width = terminal_width() if max_width is None else max_width
+    fit = max(1, (width - reserve) // cell_width)
+    return -(-n // fit)
+
+def _blocks(a, f, fill):
+    """(n, m) -> (ceil(n/f), ceil(m/f), f*f) blocks, padding the edge with fill."""
+    n, m = a.shape
+    N, M = -(-n // f), -(-m // f)
+    a = np.pad(a, ((0, N * f - n), (0, M * f - m)), constant_values=fill)
+    return a.reshape(N, f, M, f).swapaxes(1, 2).reshape(N, M, f * f)
+
+def downsample_values(V, f):
+    """Mean of each f x f block (edge blocks average only their real cells)."""
+    if f <= 1:
+        return V
+    return np.nanmean(_blocks(np.asarray(V, dtype=float), f, np.nan), axis=-1)
+
+def _write(text, out):
+    (sys.stdout if out is None else out).write(text)
+
+def _title(title, f):
+    return title if f <= 1 else f"{title} [{f}x{f} blocks]"
+
+# ---------- frames ----------
+def format_value_table(V, title, max_width=None):
+    V = np.asarray(V)
+    f = block_factor(V.shape[1], 7, max_width=max_width)
+    Vd = downsample_values(V, f)
+    fmt = " ".join(["%6.2f"] * Vd.shape[1])
+    rows = [fmt % tuple(row) for row in Vd.tolist()]
+    return f"\n{_title(title, f)}\n" + "\n".join(rows) + "\n"
+
+def format_policy_arrows(env, policy_idx, title, max_width=None):
+    """Goal cells shown as ' G ', walls as ' # ', everything else as the greedy arrow."""
+    policy_idx = np.asarray(policy_idx)
+    f = block_factor(policy_idx.shape[1], 3, max_width=max_width)
+    if f > 1:
+        term = _blocks(env.terminal_grid, f, False).any(axis=-1)
+        wall = _blocks(env.wall_grid, f, True).all(axis=-1)
+        policy_idx = policy_idx[::f, ::f]
+    else:
+        term, wall = env.terminal_grid, env.wall_grid
+    cells = np.where(term, "G", np.where(wall, "#", ARROWS[np.clip(policy_idx, 0, None)]))
+    rows = [" " + "  ".join(row) + " " for row in cells.tolist()]
+    return f"\n{_title(title, f)}\n" + "\n".join(rows) + "\n"
+
+def format_terminal_heatmap(V, title, max_width=None):
+    """
+    ANSI 256-colour heatmap on the grey ramp 232..255, with the numbers to the right of
+    the colour blocks. Row/column labels keep the original indices when downsampled.
+    """
+    V = np.asarray(V, dtype=float)
+    f = block_factor(V.shape[1], 8, reserve=12, max_width=max_width)
+    Vd = downsample_values(V, f)
+    vmin, vmax = float(np.min(Vd)), float(np.max(Vd))
+    span = vmax - vmin if vmax != vmin else 1.0
+    levels = np.rint((Vd - vmin) / span * 23).astype(int)
+
+    fmt = " ".join(["%5.2f"] * Vd.shape[1])
+    lines = [f"\n{_title(title, f)} (terminal heatmap)",
+             "    " + " ".join(f" c{j * f} " for j in range(Vd.shape[1]))]
+    for i, (blocks, nums) in enumerate(zip(HEAT_BLOCKS[levels].tolist(), Vd.tolist())):
+        lines.append(f"r{i * f}  " + "".join(blocks) + "   " + fmt % tuple(nums))
+    return "\n".join(lines) + "\n"
+
+def print_value_table(V, title, out=None, max_width=None):
+    _write(format_value_table(V, title, max_width), out)
+
+def print_policy_arrows(env, policy_idx, title, out=None, max_width=None):
+    _write(format_policy_arrows(env, policy_idx, title, max_width), out)
+
+def print_terminal_heatmap(V, title, out=None, max_width=None):
+    _write(format_terminal_heatmap(V, title, max_width), out)
+
+# ---------- binary export ----------
+def save_npy(prefix, V, policy_idx=None):
+    """
+    Write V to <prefix>.V.npy and, if given, the policy (int8, -1 = goal) to <prefix>.pi.npy.
+    Returns the paths written; np.load(..., mmap_mode="r") reads them back without a copy.
+    """
+    paths = [f"{prefix}.V.npy"]
+    np.save(paths[0], np.asarray(V))
+    if policy_idx is not None:
+        paths.append(f"{prefix}.pi.npy")
+        np.save(paths[1], np.asarray(policy_idx, dtype=np.int8))
+    return paths
@@ -0,0 +1,129 @@
+# rollout.py
+# Single-stream episode rollouts for the per-episode MC paths. One episode at a time is a
+# scalar Python loop, so the loop is reduced to list lookups: the compiled model (landing
+# state, reward and done flag per flat s * A + a) and the greedy action per state are held
+# as Python lists, the randomness comes from blocks of uniforms pre-drawn from a
+# numpy.random.Generator instead of one `random` call per decision, and each step is
+# written into caller-owned buffers reused across episodes.
+#
+# One uniform u drives each epsilon-greedy step: u < epsilon explores with action
+# floor(u / epsilon * A), which is uniform over the A actions given u < epsilon, otherwise
+# the cached greedy action is taken; the start state takes one uniform as well. Episodes
+# thus follow the same distribution as GridWorld.step plus an argmax over Q per step.
+#
+#   stream = RolloutStream(env, np.random.default_rng(0), epsilon=0.1, max_steps=200)
+#   stream.set_greedy(Q)                        # then update_greedy(Q, states) as Q changes
+#   out = ([0] * 200, [0] * 200, [0] * 200, [0.0] * 200)
+#   n = stream.episode(out)                     # states, actions, keys, rewards in out[i][:n]
+
+import numpy as np
+
+BLOCK = 4096  # uniforms per pre-drawn block (at least max_steps + 1)
+
+class RolloutStream:
+    def __init__(self, env, rng, epsilon=0.1, max_steps=200, block=BLOCK):
+        self.env = env
+        self.rng = rng
+        self.max_steps = int(max_steps)
+        self.block = max(int(block), self.max_steps + 1)
+        self.n_actions = env.n_actions
+        self.set_epsilon(epsilon)
+        self.greedy = [0] * env.n_states
+        self.load_model()
+
+        # Current block of uniforms, read position, and the generator state it was drawn from
+        self._u = []
+        self._pos = 0
+        self._block_state = None
+
+    def load_model(self):
+        """(Re)read the compiled model of env, e.g. after GridWorld.update_tiles."""
+        env = self.env
+        starts = np.flatnonzero(~(env.terminal_mask | env.wall_mask))
+        self._model = (env.next_state.ravel().tolist(), env.reward_sa.ravel().tolist(),
+                       env.done_sa.ravel().tolist(), starts.tolist(), self.n_actions)
+
+    def set_epsilon(self, epsilon):
+        """Exploration rate of the following epsilon-greedy episodes."""
+        self.epsilon = float(epsilon)
+        self._scale = self.n_actions / self.epsilon if self.epsilon > 0 else 0.0  # u < eps -> action
+
+    # ----- greedy cache -----
+    def set_greedy(self, Q):
+        """Greedy action (first max) of every state from Q, shape (N, N, A) or (S, A)."""
+        self.greedy = np.argmax(np.reshape(Q, (-1, self.n_actions)), axis=1).tolist()
+
+    def update_greedy(self, Q, states):
+        """Refresh the greedy action of `states` only (the ones whose Q rows changed)."""
+        Q2 = np.reshape(Q, (-1, self.n_actions))
+        states = np.asarray(states)
+        greedy = self.greedy
+        for s, a in zip(states.tolist(), np.argmax(Q2[states], axis=1).tolist()):
+            greedy[s] = a
+
+    # ----- random stream -----
+    def _refill(self):
+        self._block_state = self.rng.bit_generator.state
+        self._u = self.rng.random(self.block).tolist()
+        self._pos = 0
+
+    def get_state(self):
+        """JSON-able position in the random stream (for checkpoints)."""
+        return dict(block_state=self._block_state, pos=self._pos)
+
+    def set_state(self, state):
+        """Redraw the saved block from its generator state and continue at the saved position."""
+        if state["block_state"] is None:
+            self._u, self._pos, self._block_state = [], 0, None
+            return
+        self.rng.bit_generator.state = state["block_state"]
+        self._refill()
+        self._pos = state["pos"]
+
+    # ----- episodes -----
+    def episode(self, out, policy=None):
+        """
+        Play one episode from a uniform random start into out = (states, actions, keys,
+        rewards), lists of at least max_steps entries (keys[t] = s * A + a): epsilon-greedy
+        on the cached greedy actions, or the fixed action list `policy` (one per flat
+        state) if given. Stops on landing on a goal or after max_steps. Returns the length.
+        """
+        u, pos = self._u, self._pos
+        if len(u) - pos <= self.max_steps:  # a whole episode fits without bounds checks
+            self._refill()
+            u, pos = self._u, 0
+        nxt, rew, done, starts, A = self._model
+        s = starts[int(u[pos] * len(starts))]  # u < 1 keeps the product below len(starts)
+        pos += 1
+
+        states, actions, keys, rewards = out
+        n = self.max_steps
+        if policy is None:
+            greedy, eps, scale = self.greedy, self.epsilon, self._scale
+            for t in range(n):
+                x = u[pos + t]
+                a = min(int(x * scale), A - 1) if x < eps else greedy[s]
+                k = s * A + a
+                states[t] = s
+                actions[t] = a
+                keys[t] = k
+                rewards[t] = rew[k]
+                if done[k]:
+                    n = t + 1
+                    break
+                s = nxt[k]
+            pos += n
+        else:
+            for t in range(n):
+                a = policy[s]
+                k = s * A + a
+                states[t] = s
+                actions[t] = a
+                keys[t] = k
+                rewards[t] = rew[k]
+                if done[k]:
+                    n = t + 1
+                    break
+                s = nxt[k]
+        self._pos = pos
+        return n
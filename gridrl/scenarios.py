@@ -0,0 +1,187 @@
+# scenarios.py
+# Batched value iteration over K variants of one map: different landing rewards (grey
+# penalty, goal reward, ...) and/or discounts on the same walls, goals and moves. The K value
+# functions are stacked into one (K, S) array and backed up together: every action of every
+# variant gathers through the shared next_state table, and variants that have converged
+# are dropped from the working arrays so they stop costing work.
+#
+# Since the landing reward depends only on the landing tile, Q_k(s, a) = W_k[next(s, a)] with
+# W_k = r_k + gamma_k * V_k (no future term on goals), so a sweep is one (K, S) update plus
+# A gathers and maxima; V*, sweeps and the greedy policy match ValueIterationAgent per variant.
+#
+#   batch = ScenarioBatch.from_grid(env, gammas=[0.9, 0.99], substitutions=[{}, {-5.0: -10.0}])
+#   batch.run_value_iteration(n_workers=2); batch.update_greedy_policy()
+
+import itertools
+
+import numpy as np
+
+from .pool import env_pool, worker_env
+from .value_iteration_agent import precision_theta
+
+# ---------------- Process-pool workers ----------------
+def _solve_chunk(task):
+    """
+    Solve one slice of the variants in a worker; returns (V, sweeps, backups, sweep
+    events), the events recorded only when the parent run is instrumented.
+    """
+    rewards, gammas, theta, dtype, max_iterations, terminal_value, instrumented = task
+    batch = ScenarioBatch(worker_env(), rewards, gammas, theta, dtype)
+    if instrumented:
+        from .instrument import Instrumentation
+        batch.instrument = Instrumentation()
+    batch.run_value_iteration(max_iterations, terminal_value)
+    return batch.V, batch.sweeps, batch.backups, batch.instrument.sweeps if instrumented else []
+
+class ScenarioBatch:
+    def __init__(self, env, rewards=None, gammas=0.9, theta_threshold=1e-9, dtype=np.float64):
+        """
+        rewards: (K, N, N) landing-reward grids, or one (N, N) grid (default env.reward);
+        gammas: scalar or (K,). The two are broadcast against each other to K variants.
+        Walls and goals come from env and are shared by all variants.
+        """
+        self.env = env
+        self.env_size = env.get_size()
+        self.dtype = np.dtype(dtype)
+        self.theta_threshold = float(theta_threshold)
+
+        N = self.env_size
+        rewards = np.asarray(env.reward if rewards is None else rewards, dtype=float).reshape(-1, N * N)
+        gammas = np.atleast_1d(np.asarray(gammas, dtype=float))
+        K = max(len(rewards), len(gammas))
+        if len(rewards) not in (1, K) or len(gammas) not in (1, K):
+            raise ValueError(f"{len(rewards)} reward grids and {len(gammas)} gammas do not broadcast")
+        self.rewards = np.broadcast_to(rewards, (K, N * N)).copy()
+        self.rewards[:, env.wall_mask] = 0.0  # walls are never entered (as in compile_model)
+        self.gammas = np.broadcast_to(gammas, (K,)).copy()
+        self.n_scenarios = K
+
+        # Per-variant results
+        self.V = np.zeros((K, N, N), dtype=self.dtype)
+        self.pi_idx = np.zeros((K, N, N), dtype=int)
+        self.sweeps = np.zeros(K, dtype=np.int64)
+        self.backups = 0
+
+        # Optional Instrumentation (one "sweep" event per batched sweep); None = off
+        self.instrument = None
+
+    @classmethod
+    def from_grid(cls, env, gammas=(0.9,), substitutions=({},), theta_threshold=1e-9, dtype=np.float64):
+        """
+        Cartesian product of gammas x reward substitutions. A substitution maps an existing
+        tile reward to a new one, e.g. {-5.0: -10.0} re-prices every grey tile of the default
+        map and {10.0: 20.0} the goal. self.labels holds (gamma, substitution) per variant.
+        """
+        pairs = list(itertools.product(gammas, substitutions))
+        rewards = np.empty((len(pairs), env.env_size, env.env_size))
+        for k, (_, sub) in enumerate(pairs):
+            rewards[k] = env.reward
+            for old, new in sub.items():
+                rewards[k][env.reward == old] = new
+        batch = cls(env, rewards, [g for g, _ in pairs], theta_threshold, dtype)
+        batch.labels = pairs
+        return batch
+
+    def effective_thetas(self):
+        """Per-variant stopping threshold (see ValueIterationAgent.effective_theta)."""
+        r_max = np.abs(self.rewards).max(axis=1)
+        return np.array([precision_theta(self.theta_threshold, self.dtype, r, g, self.env.n_states)
+                         for r, g in zip(r_max, self.gammas)])
+
+    # ----- solvers -----
+    def run_value_iteration(self, max_iterations=10_000, terminal_value=0.0, n_workers=None):
+        """
+        Synchronous VI of all variants at once; each variant stops on its own residual.
+        With n_workers set, the variants are dealt to n_workers slices (see _run_parallel)
+        solved in a process pool, each slice batched as above; an attached Instrumentation
+        receives the workers' sweep events. Returns the sweeps per variant.
+        """
+        if n_workers and n_workers > 1 and self.n_scenarios > 1:
+            return self._run_parallel(n_workers, max_iterations, terminal_value)
+
+        env = self.env
+        S = env.n_states
+        next_cols = [np.ascontiguousarray(env.next_state[:, a]) for a in range(env.n_actions)]
+        future = ~env.terminal_mask  # no future term after landing on a goal
+
+        thetas = self.effective_thetas().astype(self.dtype)  # compared in self.dtype, as the agent does
+        idx = np.arange(self.n_scenarios)             # variants still in the working arrays
+        R = self.rewards.astype(self.dtype)
+        G = (self.gammas[:, None] * future[None, :]).astype(self.dtype)
+        V_old = np.array(self.V, dtype=self.dtype).reshape(-1, S)
+        V_old[:, env.terminal_mask] = terminal_value
+        V_new = np.empty_like(V_old)
+        W = np.empty_like(V_old)
+        tmp = np.empty_like(V_old)
+        V_out = V_old.copy()
+        inst = self.instrument
+        if inst is not None:
+            inst.start("vi_scenarios")
+
+        # Walls land on themselves with reward 0 and V 0, so they need no masking; goal
+        # rows are overwritten with terminal_value after the max.
+        iters, backups = 0, 0
+        while idx.size and iters < max_iterations:
+            np.multiply(G, V_old, out=W)
+            W += R
+            np.take(W, next_cols[0], axis=1, out=V_new, mode="clip")
+            for cols in next_cols[1:]:
+                np.take(W, cols, axis=1, out=tmp, mode="clip")
+                np.maximum(V_new, tmp, out=V_new)
+            V_new[:, env.terminal_mask] = terminal_value
+            iters += 1
+            backups += idx.size * S
+
+            np.subtract(V_new, V_old, out=tmp)
+            np.abs(tmp, out=tmp)
+            residual = tmp.max(axis=1)
+            V_old, V_new = V_new, V_old
+            done = residual <= thetas[idx]
+            if inst is not None:
+                inst.sweep("vi_scenarios", iters, residual.max(), idx.size * S)
+            if done.any():  # retire converged variants, compact the working arrays
+                V_out[idx[done]] = V_old[done]
+                self.sweeps[idx[done]] = iters
+                keep = ~done
+                idx, R, G, V_old = idx[keep], R[keep], G[keep], V_old[keep]
+                V_new, W, tmp = np.empty_like(V_old), np.empty_like(V_old), np.empty_like(V_old)
+
+        V_out[idx] = V_old  # hit max_iterations
+        self.sweeps[idx] = iters
+        self.V = V_out.reshape(self.n_scenarios, self.env_size, self.env_size)
+        self.backups = backups
+        return self.sweeps
+
+    def _run_parallel(self, n_workers, max_iterations, terminal_value):
+        """
+        Deal the variants round-robin in order of decreasing gamma, so each worker gets a
+        similar mix of slow (high gamma) and fast variants, then put the results back in order.
+        """
+        order = np.argsort(-self.gammas, kind="stable")
+        chunks = [order[w::n_workers] for w in range(min(n_workers, self.n_scenarios))]
+        inst = self.instrument
+        tasks = [(self.rewards[c], self.gammas[c], self.theta_threshold, self.dtype, max_iterations,
+                  terminal_value, inst is not None) for c in chunks]
+        with env_pool(len(chunks), self.env) as pool:
+            results = list(pool.map(_solve_chunk, tasks))
+        V = np.empty_like(self.V)
+        for c, (V_c, sweeps_c, _, events) in zip(chunks, results):
+            V[c] = V_c
+            self.sweeps[c] = sweeps_c
+            if inst is not None:
+                inst.add_sweeps(events)
+        self.V = V
+        self.backups = sum(r[2] for r in results)
+        return self.sweeps
+
+    # ----- greedy policies -----
+    def update_greedy_policy(self):
+        """pi_k(s) = argmax_a Q_k(s,a) per variant (first max wins); goals are marked -1."""
+        env = self.env
+        future = ~env.terminal_mask
+        for k in range(self.n_scenarios):
+            W = self.rewards[k] + self.gammas[k] * np.where(future, self.V[k].ravel(), 0.0)
+            pi = np.argmax(W[env.next_state], axis=1)
+            pi[env.terminal_mask] = -1
+            self.pi_idx[k] = pi.reshape(self.env_size, self.env_size)
+        return self.pi_idx
@@ -0,0 +1,314 @@
+# server.py
+# Local asyncio evaluation service for solved tables (stdlib + NumPy only). The protocol is
+# one JSON object per line over TCP, answered with one JSON line, in order per connection:
+#   {"op": "solve",  "env": {...}}                      -> table info (shared-memory names)
+#   {"op": "lookup", "env": {...}, "states": [...]}     -> {"actions": [...], "values": [...]}
+#   {"op": "unload", "env": {...}}                      -> {"unloaded": true/false}
+#   {"op": "stats"}                                     -> counters and p50/p99 latency per op
+# env keys are the CLI's map options: size, random, seed, map, rewards, gamma, theta, dtype
+# (CLI defaults when omitted). map / rewards are file names inside the server's map_dir
+# (--map-dir) and are refused without one. states are flat indices s = i * N + j, or [i, j] pairs.
+#
+# Solves run in a worker thread so the loop keeps answering. Concurrent solve/lookup
+# requests for the same env parameters await the same solver run (request coalescing).
+# The solved V and greedy policy are published in multiprocessing.shared_memory, so local
+# processes can attach_tables() to a solve reply and index them directly instead of
+# round-tripping every lookup through the socket. At most max_tables tables are kept; the
+# least recently used one is unlinked to make room (processes attached to it keep their
+# mapping), and "unload" drops one explicitly.
+#
+#   gridrl serve --port 8765
+#   async with await EvalClient.connect(port=8765) as c: await c.lookup({"size": 5}, [0, 7])
+
+import asyncio
+import json
+import os
+import sys
+import time
+import types
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DEFAULT_ENV = dict(size=5, map=None, rewards=None, random=False, seed=42, gamma=0.9, theta=1e-9,
+                   dtype="float64")
+LATENCY_WINDOW = 10_000  # most recent requests kept per op for the percentiles
+LINE_LIMIT = 2**24       # max bytes per request/reply line (batched lookups can be long)
+MAX_TABLES = 64          # solved tables kept in shared memory before the least recently used goes
+OPS = ("solve", "lookup", "unload", "stats")
+
+def map_path(map_dir, name):
+    """name resolved inside map_dir; paths that leave it (or any path without a map_dir) are refused."""
+    if map_dir is None:
+        raise ValueError("map files are disabled on this server (no --map-dir)")
+    root = os.path.realpath(map_dir)
+    path = os.path.realpath(os.path.join(root, str(name)))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"map {name!r} is outside the map directory")
+    return path
+
+def env_params(env, map_dir=None):
+    """
+    CLI defaults filled in; unknown keys are an error, map / rewards are resolved inside
+    map_dir. Returns (coalescing key, params).
+    """
+    unknown = set(env) - set(DEFAULT_ENV)
+    if unknown:
+        raise ValueError(f"unknown env keys: {sorted(unknown)}")
+    params = dict(DEFAULT_ENV, **env)
+    for name in ("map", "rewards"):
+        if params[name] is not None:
+            params[name] = map_path(map_dir, params[name])
+    if params["map"] is None and not (isinstance(params["size"], int) and params["size"] >= 2):
+        raise ValueError(f"size must be an integer of at least 2, not {params['size']!r}")
+    return json.dumps(params, sort_keys=True), params
+
+def solve_tables(params, cache=None):
+    """Build the env and solve it with batch VI (through cache if given). Runs off the loop."""
+    from .cli import build_env
+    from .value_iteration_agent import ValueIterationAgent
+    env = build_env(types.SimpleNamespace(**params))
+    agent = ValueIterationAgent(env, params["gamma"], params["theta"], params["dtype"])
+    t0 = time.perf_counter()
+    if cache is not None:
+        sweeps = agent.run_value_iteration_cached(cache)
+    else:
+        sweeps = agent.run_value_iteration_vectorized()
+        agent.update_greedy_policy()
+    return agent.V, agent.pi_idx, dict(sweeps=int(sweeps), solve_s=time.perf_counter() - t0)
+
+_OWNED = set()  # names of the segments created by this process (see attach_tables)
+
+class SharedTable:
+    """V and the greedy policy (int8, -1 = goal) of one solved env in named shared memory."""
+    def __init__(self, V, pi_idx, meta):
+        self._segments = []
+        self.V = self._share(np.asarray(V))
+        self.pi = self._share(np.asarray(pi_idx, dtype=np.int8))
+        self.meta = meta
+
+    def _share(self, arr):
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        out = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+        out[...] = arr
+        self._segments.append(shm)
+        _OWNED.add(shm.name)
+        return out
+
+    def info(self):
+        V_shm, pi_shm = self._segments
+        return dict(shape=list(self.V.shape), **self.meta,
+                    V=dict(name=V_shm.name, dtype=self.V.dtype.str),
+                    pi=dict(name=pi_shm.name, dtype=self.pi.dtype.str))
+
+    def close(self):
+        self.V = self.pi = None  # drop the views first, or the buffers cannot be released
+        for shm in self._segments:
+            _OWNED.discard(shm.name)
+            shm.close()
+            shm.unlink()
+
+def attach_tables(info):
+    """
+    Map the V / policy arrays of a solve reply from another local process (read-only
+    views). Returns (V, pi, segments); keep segments alive while using the arrays.
+    The server owns the memory: attaching does not register it for cleanup here, and
+    attaching in the server's own process leaves the server's registration alone.
+    """
+    shape = tuple(info["shape"])
+    arrays, segments = [], []
+    for part in ("V", "pi"):
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(info[part]["name"], track=False)
+        else:
+            shm = shared_memory.SharedMemory(info[part]["name"])
+            if shm.name not in _OWNED:  # the owner unlinks, not us
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+        arr = np.ndarray(shape, dtype=np.dtype(info[part]["dtype"]), buffer=shm.buf)
+        arr.flags.writeable = False
+        arrays.append(arr)
+        segments.append(shm)
+    return arrays[0], arrays[1], segments
+
+class EvalServer:
+    def __init__(self, cache=None, max_tables=MAX_TABLES, map_dir=None):
+        """
+        cache: optional SolveCache, so restarts reload V* instead of re-solving.
+        max_tables: solved tables kept in shared memory (least recently used evicted first).
+        map_dir: directory that env map / rewards names are read from (None refuses them).
+        """
+        self.cache = cache
+        self.map_dir = map_dir
+        self.max_tables = max(int(max_tables), 1)
+        self.tables = OrderedDict()  # coalescing key -> SharedTable, least recently used first
+        self._inflight = {}   # coalescing key -> Task of the solve in progress
+        self._server = None
+        self.port = None
+
+        # Counters and per-op latency windows (seconds)
+        self.counts = dict(requests=0, solves=0, coalesced=0, evictions=0, errors=0)
+        self.latency = {}
+
+    # ---------- tables ----------
+    async def get_table(self, env):
+        """Solved table for env params: cached, joined to an in-flight solve, or solved now."""
+        key, params = env_params(env, self.map_dir)
+        while True:
+            table = self.tables.get(key)
+            if table is not None:
+                self.tables.move_to_end(key)
+                return key, table
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._solve(key, params))
+                self._inflight[key] = task
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            else:
+                self.counts["coalesced"] += 1
+            table = await asyncio.shield(task)  # one client going away must not cancel the solve
+            if table.V is not None:  # else evicted by other solves before this waiter resumed
+                return key, table
+
+    async def _solve(self, key, params):
+        loop = asyncio.get_running_loop()
+        V, pi_idx, meta = await loop.run_in_executor(None, solve_tables, params, self.cache)
+        table = SharedTable(V, pi_idx, meta)
+        while len(self.tables) >= self.max_tables:
+            _, old = self.tables.popitem(last=False)
+            old.close()
+            self.counts["evictions"] += 1
+        self.tables[key] = table
+        self.counts["solves"] += 1
+        return table
+
+    def unload(self, env):
+        """Unlink the table of env params if loaded; returns whether one was."""
+        key, _ = env_params(env, self.map_dir)
+        table = self.tables.pop(key, None)
+        if table is not None:
+            table.close()
+        return table is not None
+
+    @staticmethod
+    def _flat_states(states, N):
+        s = np.asarray(states, dtype=np.int64)
+        if s.ndim == 2 and s.shape[1] == 2:
+            if np.any((s < 0) | (s >= N)):
+                raise ValueError(f"cell out of range for a {N}x{N} grid")
+            return s[:, 0] * N + s[:, 1]
+        s = s.ravel()
+        if np.any((s < 0) | (s >= N * N)):
+            raise ValueError(f"state out of range for a {N}x{N} grid")
+        return s
+
+    # ---------- requests ----------
+    async def handle(self, request):
+        op = request.get("op")
+        if op == "solve":
+            key, table = await self.get_table(request.get("env", {}))
+            return dict(key=key, **table.info())
+        if op == "lookup":
+            _, table = await self.get_table(request.get("env", {}))
+            s = self._flat_states(request["states"], table.V.shape[0])
+            return dict(actions=table.pi.ravel()[s].tolist(), values=table.V.ravel()[s].tolist())
+        if op == "unload":
+            return dict(unloaded=self.unload(request.get("env", {})))
+        if op == "stats":
+            return self.stats()
+        raise ValueError(f"unknown op {op!r}")
+
+    async def _serve_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                t0 = time.perf_counter()
+                op = "invalid"
+                try:
+                    request = json.loads(line)
+                    op = request.get("op") if request.get("op") in OPS else "invalid"
+                    reply = await self.handle(request)
+                except Exception as e:  # any failure answers this request only, never the connection
+                    reply = dict(error=f"{type(e).__name__}: {e}")
+                    self.counts["errors"] += 1
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+                self.counts["requests"] += 1
+                self.latency.setdefault(op, deque(maxlen=LATENCY_WINDOW)).append(time.perf_counter() - t0)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def stats(self):
+        ops = {}
+        for op, window in self.latency.items():
+            ms = np.fromiter(window, dtype=float) * 1000.0
+            ops[op] = dict(count=ms.size, p50_ms=float(np.percentile(ms, 50)),
+                           p99_ms=float(np.percentile(ms, 99)), max_ms=float(ms.max()))
+        return dict(self.counts, tables=len(self.tables), latency=ops)
+
+    # ---------- lifecycle ----------
+    async def start(self, host="127.0.0.1", port=0):
+        """Listen on host:port (port 0 picks a free one, stored in self.port)."""
+        self._server = await asyncio.start_server(self._serve_client, host, port, limit=LINE_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in list(self._inflight.values()):
+            await asyncio.gather(task, return_exceptions=True)
+        for table in self.tables.values():
+            table.close()
+        self.tables.clear()
+
+class EvalClient:
+    """Minimal client for one connection; requests on it are serialized."""
+    def __init__(self, reader, writer):
+        self._reader, self._writer = reader, writer
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765):
+        return cls(*await asyncio.open_connection(host, port, limit=LINE_LIMIT))
+
+    async def request(self, **request):
+        async with self._lock:
+            self._writer.write(json.dumps(request).encode() + b"\n")
+            await self._writer.drain()
+            line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise ValueError(reply["error"])
+        return reply
+
+    async def solve(self, env=None):
+        return await self.request(op="solve", env=env or {})
+
+    async def lookup(self, env, states):
+        return await self.request(op="lookup", env=env or {}, states=np.asarray(states).tolist())
+
+    async def unload(self, env):
+        return await self.request(op="unload", env=env or {})
+
+    async def stats(self):
+        return await self.request(op="stats")
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
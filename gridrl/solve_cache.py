@@ -0,0 +1,130 @@
+# solve_cache.py
+# Content-addressed on-disk cache of DP solutions. The key hashes the compiled GridWorld model
+# (next_state, reward_sa, done_sa, terminal_mask) plus the solver parameters, so any change to
+# the map or to gamma/theta is a different entry. Entries are compressed .npz files holding V*,
+# the greedy policy and the solve stats; the directory is capped in bytes with LRU eviction
+# (file mtime is the recency stamp, refreshed on every hit).
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gridrl")
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+def model_key(env):
+    """Digest of the compiled dynamics; identical maps hash equal whatever way they were built."""
+    h = hashlib.blake2b(digest_size=16)
+    for arr in (env.next_state, env.reward_sa, env.done_sa, env.terminal_mask):
+        arr = np.ascontiguousarray(arr)
+        h.update(f"{arr.dtype.str}{arr.shape}".encode())
+        h.update(arr.data)
+    return h.hexdigest()
+
+def params_key(params):
+    text = ";".join(f"{k}={params[k]!r}" for k in sorted(params))
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+class SolveCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        """directory defaults to $GRIDRL_CACHE_DIR, else ~/.cache/gridrl."""
+        self.directory = directory or os.environ.get("GRIDRL_CACHE_DIR", DEFAULT_DIR)
+        self.max_bytes = int(max_bytes)
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Counters of this cache object (hits / misses / warm starts / evicted files)
+        self.hits = 0
+        self.misses = 0
+        self.warm_starts = 0
+        self.evictions = 0
+
+    def _path(self, mkey, params):
+        return os.path.join(self.directory, f"{mkey}-{params_key(params)}.npz")
+
+    def _entries(self, prefix=""):
+        """(path, size, mtime) of every cache file, optionally restricted to one model."""
+        out = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz") and name.startswith(prefix):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:  # evicted concurrently
+                    continue
+                out.append((path, st.st_size, st.st_mtime))
+        return out
+
+    # ---------- lookup ----------
+    def get(self, env, params, mkey=None):
+        """
+        Exact hit for (model, params) as a dict of arrays (V, pi_idx, stats...), else None.
+        A hit refreshes the entry's LRU stamp.
+        """
+        path = self._path(mkey or model_key(env), params)
+        try:
+            with np.load(path) as data:
+                entry = {k: data[k] for k in data.files}
+        except (FileNotFoundError, OSError, ValueError):  # missing, or a truncated/corrupt file
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return entry
+
+    def nearest(self, env, params, mkey=None):
+        """
+        V of the cached entry for the same model whose parameters are closest to params
+        (same solver and terminal value; smallest |Δgamma|, then tightest theta), or None.
+        Used as a warm start: any V converges to V*, a nearby one in fewer sweeps.
+        """
+        best, best_rank = None, None
+        for path, _, _ in self._entries(prefix=mkey or model_key(env)):
+            try:
+                with np.load(path) as data:
+                    meta = {k: data[k].item() for k in ("solver", "gamma", "theta", "terminal_value")}
+                    if meta["solver"] != params["solver"] or meta["terminal_value"] != params["terminal_value"]:
+                        continue
+                    rank = (abs(meta["gamma"] - params["gamma"]), meta["theta"])
+                    if best_rank is None or rank < best_rank:
+                        best, best_rank = data["V"], rank
+            except (OSError, ValueError, KeyError):
+                continue
+        if best is not None:
+            self.warm_starts += 1
+        return best
+
+    # ---------- store ----------
+    def put(self, env, params, mkey=None, **arrays):
+        """Store arrays (V, pi_idx, sweeps, ...) under (model, params), then enforce the size cap."""
+        path = self._path(mkey or model_key(env), params)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:  # write-then-rename: readers never see a partial file
+            np.savez_compressed(f, **params, **arrays)
+        os.replace(tmp, path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep=None):
+        entries = sorted(self._entries(), key=lambda e: e[2])  # oldest first
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            os.remove(path)
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size, _ in self._entries())
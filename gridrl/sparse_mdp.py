@@ -0,0 +1,94 @@
+# sparse_mdp.py
+# Sparse (CSR-style) MDP model: one compressed transition matrix P_a per action plus
+# expected-reward vectors r_a. Memory is O(nnz) instead of O(S^2), so slippery grids
+# with 10^6 states fit comfortably. Hand-rolled on NumPy (no scipy needed).
+
+import numpy as np
+
+class SparseMDP:
+    def __init__(self, n_states, indptr, indices, probs, expected_reward, terminal_mask):
+        """
+        Per action a (lists of length A):
+        - indptr[a]  : (S+1,) row pointers into indices[a]/probs[a]
+        - indices[a] : (nnz_a,) successor state indices
+        - probs[a]   : (nnz_a,) transition probabilities, each row sums to 1
+        - expected_reward[a] : (S,) E[reward of landing tile | s, a]
+        terminal_mask : (S,) True for terminal states; their value never feeds back.
+        """
+        self.n_states = int(n_states)
+        self.n_actions = len(indptr)
+        self.indptr = indptr
+        self.indices = indices
+        self.probs = probs
+        self.expected_reward = expected_reward
+        self.terminal_mask = terminal_mask
+
+        for a in range(self.n_actions):
+            if np.any(np.diff(indptr[a]) == 0):
+                raise ValueError(f"action {a}: every state needs at least one successor")
+
+    # ---------- construction ----------
+    @classmethod
+    def from_gridworld(cls, env, slip=0.0):
+        """
+        Slippery version of env: the intended move happens with prob 1-slip, otherwise
+        the agent slides to one of the two perpendicular moves (slip/2 each).
+        slip=0 reproduces the deterministic GridWorld exactly.
+        """
+        S, A = env.n_states, env.n_actions
+        moves = np.array(env.actions)
+        rows = np.arange(S)
+
+        indptr, indices, probs, expected_reward = [], [], [], []
+        for a in range(A):
+            perpendicular = [b for b in range(A) if moves[a] @ moves[b] == 0]
+            outcomes = [(a, 1.0 - slip)] + [(b, slip / len(perpendicular)) for b in perpendicular]
+            outcomes = [(b, p) for (b, p) in outcomes if p > 0.0]
+
+            r = np.zeros(S, dtype=float)
+            for b, p in outcomes:
+                r += p * env.reward_sa[:, b]
+
+            # COO triplets, then merge duplicates (e.g. two slips that both bump into a wall)
+            src = np.concatenate([rows] * len(outcomes))
+            dst = np.concatenate([env.next_state[:, b] for b, _ in outcomes])
+            p = np.concatenate([np.full(S, p) for _, p in outcomes])
+            key = src.astype(np.int64) * S + dst
+            order = np.argsort(key, kind="stable")
+            key, p = key[order], p[order]
+            first = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+            key, merged = key[first], np.add.reduceat(p, first)
+
+            row_of = key // S
+            ptr = np.zeros(S + 1, dtype=np.int64)
+            np.cumsum(np.bincount(row_of, minlength=S), out=ptr[1:])
+
+            indptr.append(ptr)
+            indices.append((key % S).astype(np.int32))
+            probs.append(merged)
+            expected_reward.append(r)
+
+        return cls(S, indptr, indices, probs, expected_reward, env.terminal_mask.copy())
+
+    # ---------- backups ----------
+    def expected_next_value(self, V_flat, out=None):
+        """
+        E[V(s') | s, a] for all states and actions as A sparse mat-vecs, shape (S, A).
+        Terminal successors contribute 0 (no future term after reaching the goal).
+        """
+        V_cont = np.where(self.terminal_mask, 0.0, V_flat)
+        if out is None:
+            out = np.empty((self.n_states, self.n_actions), dtype=float)
+        for a in range(self.n_actions):
+            weighted = self.probs[a] * V_cont[self.indices[a]]
+            out[:, a] = np.add.reduceat(weighted, self.indptr[a][:-1])
+        return out
+
+    @property
+    def nnz(self):
+        return int(sum(len(ix) for ix in self.indices))
+
+    @property
+    def nbytes(self):
+        arrays = self.indptr + self.indices + self.probs + self.expected_reward
+        return int(sum(x.nbytes for x in arrays))
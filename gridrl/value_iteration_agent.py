@@ -0,0 +1,391 @@
+# value_iteration_agent.py
+# Agent that holds the value table V and provides one-step lookahead and greedy policy utilities.
+
+import heapq
+
+import numpy as np
+
+from .render import print_policy_arrows, save_npy
+
+def precision_theta(theta, dtype, r_max, gamma, n_states):
+    """theta, floored at 4 ulps of the largest possible |V| for non-float64 dtypes."""
+    dtype = np.dtype(dtype)
+    if dtype == np.float64:
+        return float(theta)
+    v_max = float(r_max) / (1.0 - gamma) if gamma < 1.0 else float(r_max) * n_states
+    return max(float(theta), 4.0 * float(np.finfo(dtype).eps) * v_max)
+
+class ValueIterationAgent:
+    def __init__(self, env, gamma=0.9, theta_threshold=1e-9, dtype=np.float64):
+        """
+        dtype=np.float32 halves the value/Q storage and sweep bandwidth; V then agrees with
+        the float64 solve to about effective_theta() * gamma / (1 - gamma) (see README).
+        """
+        self.env = env
+        self.env_size = env.get_size()
+        self.gamma = float(gamma)
+        self.theta_threshold = float(theta_threshold)
+        self.dtype = np.dtype(dtype)
+
+        # Value function table V(s) initialized to zeros
+        self.V = np.zeros((self.env_size, self.env_size), dtype=self.dtype)
+
+        # Greedy policy storage (indices/arrows for printing)
+        self.pi_idx = np.zeros((self.env_size, self.env_size), dtype=int)
+        self.arrows = ["→", "←", "↓", "↑"]  # matches env.actions order
+
+        # Bellman backups performed by the last run_* call (single-state updates), and whether
+        # the last batch run reached theta (False when max_iterations cut it short)
+        self.backups = 0
+        self.converged = False
+
+        # Optional Instrumentation (per-sweep residuals, timings, callbacks); None = off
+        self.instrument = None
+
+    # ----- basic accessors -----
+    def get_value_function(self):
+        return self.V
+
+    def update_value_function(self, new_V):
+        self.V = np.array(new_V, dtype=self.dtype, copy=True)
+
+    def effective_theta(self):
+        """
+        Stopping threshold actually used. For float32 tables it is raised to a few ulps of
+        the largest possible |V| (max|r| / (1 - gamma)): below that the residual is rounding
+        noise and would never shrink. float64 keeps theta unchanged.
+        """
+        return precision_theta(self.theta_threshold, self.dtype, np.abs(self.env.reward_sa).max(),
+                               self.gamma, self.env.n_states)
+
+    def _model(self):
+        """(next_state, discount_sa, reward_sa) of the compiled model in the value dtype."""
+        env = self.env
+        discount_sa = np.asarray(self.gamma * ~env.done_sa, dtype=self.dtype)  # 0 after landing on terminal
+        return env.next_state, discount_sa, np.asarray(env.reward_sa, dtype=self.dtype)
+
+    def is_done(self, new_V):
+        """Stop when the largest absolute change is below theta."""
+        diff = np.max(np.abs(self.V - new_V))
+        return diff <= self.theta_threshold
+
+    # ----- core: one-step lookahead -----
+    def calculate_max_value(self, i, j):
+        """
+        Compute max_a Q(s,a) for state (i,j), and also return the argmax and its name.
+        Q(s,a) = reward(next) + gamma * V(next), but if next is terminal → no future term.
+        Reads the env's compiled (S, A) model instead of calling env.step per action.
+        Returns: (best_value, best_action_index, best_action_name)
+        """
+        s = self.env.state_index(i, j)
+        next_s = self.env.next_state[s]
+        future = np.where(self.env.done_sa[s], 0.0, self.gamma * self.V.ravel()[next_s])
+        q = self.env.reward_sa[s] + future
+        best_idx = int(np.argmax(q))  # first max wins, same tie-break as the old loop
+        best_val = float(q[best_idx])
+
+        best_name = self.env.action_description[best_idx]
+        return best_val, best_idx, best_name
+
+    # ----- vectorized Bellman backup over the compiled model -----
+    def q_values(self, V=None):
+        """Q(s,a) for all states and actions at once, shape (S, A)."""
+        V_flat = (self.V if V is None else V).ravel()
+        next_state, discount_sa, reward_sa = self._model()
+        return reward_sa + discount_sa * V_flat[next_state]
+
+    def _checkpoint_params(self, solver, terminal_value):
+        from .solve_cache import model_key
+        return dict(model=model_key(self.env), gamma=self.gamma, theta=self.theta_threshold,
+                    dtype=self.dtype.str, terminal_value=float(terminal_value), solver=solver)
+
+    def run_value_iteration_vectorized(self, max_iterations=10_000, terminal_value=0.0, checkpoint=None):
+        """
+        Synchronous (batch) value iteration with one array expression per sweep.
+        Same update and stopping rule as the per-cell batch loop, so V*, policy and
+        iteration count match; two preallocated buffers are swapped instead of copying V.
+        Terminal states are pinned to terminal_value. Returns the number of sweeps.
+        checkpoint: a Checkpointer; V and the sweep count are saved every checkpoint.every
+        sweeps and at the end, and a run with the same model/parameters resumes from the
+        last save (sweeps are deterministic, so the result equals an uninterrupted run).
+        """
+        env = self.env
+        next_state, discount_sa, reward_sa = self._model()
+        theta = self.dtype.type(self.effective_theta())  # residual <= theta compared in self.dtype
+
+        V_old = np.array(self.V, dtype=self.dtype).ravel()
+        iters = 0
+        if checkpoint is not None:
+            params = self._checkpoint_params("vi_batch", terminal_value)
+            saved = checkpoint.load("vi_batch", params)
+            if saved is not None:
+                arrays, state = saved
+                V_old[:] = arrays["V"]
+                iters = state["sweeps"]
+                if state["converged"]:
+                    self.V = V_old.reshape(self.env_size, self.env_size)
+                    self.backups = iters * env.n_states
+                    self.converged = True
+                    return iters
+
+        V_new = np.empty_like(V_old)
+        Q = np.empty(next_state.shape, dtype=self.dtype)
+        diff = np.empty_like(V_old)
+        inst = self.instrument
+        if inst is not None:
+            inst.start("vi_batch")
+
+        converged = False
+        while iters < max_iterations:
+            np.take(V_old, next_state, out=Q)
+            Q *= discount_sa
+            Q += reward_sa
+            Q.max(axis=1, out=V_new)
+            V_new[env.terminal_mask] = terminal_value
+            iters += 1
+
+            np.subtract(V_old, V_new, out=diff)
+            np.abs(diff, out=diff)
+            V_old, V_new = V_new, V_old
+            residual = diff.max()
+            if inst is not None:
+                inst.sweep("vi_batch", iters, residual, env.n_states)
+            converged = residual <= theta
+            if checkpoint is not None and (converged or checkpoint.due(iters)):
+                checkpoint.save("vi_batch", params, iters, dict(V=V_old), dict(sweeps=iters, converged=bool(converged)))
+            if converged:
+                break
+
+        self.V = V_old.reshape(self.env_size, self.env_size)
+        self.backups = iters * env.n_states
+        self.converged = bool(converged)
+        return iters
+
+    def run_value_iteration_inplace(self, max_iterations=10_000, terminal_value=0.0):
+        """
+        In-place (Gauss–Seidel) value iteration: row-major sweeps where each backup
+        immediately sees the values updated earlier in the same sweep. Returns sweeps.
+        """
+        theta = self.effective_theta()
+        inst = self.instrument
+        if inst is not None:
+            inst.start("vi_inplace")
+        iters = 0
+        while iters < max_iterations:
+            delta = 0.0
+            for i in range(self.env_size):
+                for j in range(self.env_size):
+                    old = self.V[i, j]
+                    if self.env.is_terminal_state(i, j):
+                        self.V[i, j] = terminal_value
+                    else:
+                        best_v, _, _ = self.calculate_max_value(i, j)
+                        self.V[i, j] = best_v
+                    delta = max(delta, abs(self.V[i, j] - old))
+            iters += 1
+            if inst is not None:
+                inst.sweep("vi_inplace", iters, delta, self.env.n_states)
+            if delta <= theta:
+                break
+        self.backups = iters * self.env.n_states
+        return iters
+
+    def run_value_iteration_sparse(self, mdp, max_iterations=10_000, terminal_value=0.0):
+        """
+        Batch value iteration on a SparseMDP (stochastic dynamics):
+        Q(s,a) = r_a(s) + gamma * (P_a V)(s), computed as one sparse mat-vec per action.
+        Also fills pi_idx with the greedy policy w.r.t. the final V. Returns sweeps.
+        """
+        R = np.stack(mdp.expected_reward, axis=1).astype(self.dtype)
+        theta = self.effective_theta()
+        V_old = np.array(self.V, dtype=self.dtype).ravel()
+        V_new = np.empty_like(V_old)
+        Q = np.empty_like(R)
+        inst = self.instrument
+        if inst is not None:
+            inst.start("vi_sparse")
+
+        iters = 0
+        while iters < max_iterations:
+            mdp.expected_next_value(V_old, out=Q)
+            Q *= self.gamma
+            Q += R
+            Q.max(axis=1, out=V_new)
+            V_new[mdp.terminal_mask] = terminal_value
+            iters += 1
+
+            delta = np.max(np.abs(V_new - V_old))
+            V_old, V_new = V_new, V_old
+            if inst is not None:
+                inst.sweep("vi_sparse", iters, delta, mdp.n_states)
+            if delta <= theta:
+                break
+
+        self.V = V_old.reshape(self.env_size, self.env_size)
+        self.backups = iters * mdp.n_states
+
+        Q = R + self.gamma * mdp.expected_next_value(V_old)
+        pi = np.argmax(Q, axis=1)
+        pi[mdp.terminal_mask] = -1
+        self.pi_idx = pi.reshape(self.env_size, self.env_size)
+        return iters
+
+    def run_value_iteration_prioritized(self, max_backups=None, terminal_value=0.0, seeds=None):
+        """
+        Prioritized sweeping (asynchronous VI): a max-heap of states keyed by Bellman error.
+        Pop the worst state, back it up in place, then re-score only its predecessors
+        (env.pred_indptr / env.pred_states) and push those whose error exceeds theta.
+        Stops when no state has error > theta. Returns the number of backups performed.
+        seeds: flat states to score initially (default all); the others must already be
+        consistent with V, as after a previous solve (see run_value_iteration_incremental).
+        """
+        env = self.env
+        S = env.n_states
+        next_state, discount_sa, reward_sa = self._model()
+        pred_indptr, pred_states = env.pred_indptr, env.pred_states
+        theta = self.effective_theta()
+        if max_backups is None:
+            max_backups = 10_000 * S
+
+        V = np.array(self.V, dtype=self.dtype).ravel()
+        V[env.terminal_mask] = terminal_value
+
+        # Initial priorities: Bellman error of the seed states, one vectorized pass
+        cand = np.arange(S) if seeds is None else np.unique(np.asarray(seeds, dtype=np.int64))
+        err = np.abs((reward_sa[cand] + discount_sa[cand] * V[next_state[cand]]).max(axis=1) - V[cand])
+        err[env.terminal_mask[cand]] = 0.0
+        priority = np.zeros(S, dtype=float)
+        priority[cand] = np.where(err > theta, err, 0.0)
+        heap = [(-e, s) for s, e in zip(cand.tolist(), priority[cand].tolist()) if e > 0.0]
+        heapq.heapify(heap)
+
+        backups = 0
+        while heap and backups < max_backups:
+            neg_p, s = heapq.heappop(heap)
+            if -neg_p != priority[s]:
+                continue  # stale entry, superseded by a later push
+            priority[s] = 0.0
+
+            V[s] = (reward_sa[s] + discount_sa[s] * V[next_state[s]]).max()
+            backups += 1
+
+            preds = pred_states[pred_indptr[s]:pred_indptr[s + 1]]
+            q_preds = reward_sa[preds] + discount_sa[preds] * V[next_state[preds]]
+            errs = np.abs(q_preds.max(axis=1) - V[preds])
+            for p, e in zip(preds.tolist(), errs.tolist()):
+                if e > theta and e > priority[p]:
+                    priority[p] = e
+                    heapq.heappush(heap, (-e, p))
+
+        self.V = V.reshape(self.env_size, self.env_size)
+        self.backups = backups
+        return backups
+
+    def run_value_iteration_incremental(self, changed_states, V_prev=None, max_backups=None,
+                                        terminal_value=0.0):
+        """
+        Re-solve after a few tiles changed (GridWorld.update_tiles) without starting from zeros.
+        V_prev (default: the current V, i.e. the previous solution) is still consistent
+        everywhere except at the changed states and the states that can move onto them, so
+        only those seed the prioritized-sweeping frontier; the change then propagates
+        backwards through predecessors only as far as values actually move.
+        Result matches a full solve within theta. Returns the number of backups performed.
+        """
+        env = self.env
+        changed = np.unique(np.asarray(changed_states, dtype=np.int64))
+        preds = [env.pred_states[env.pred_indptr[s]:env.pred_indptr[s + 1]] for s in changed.tolist()]
+        seeds = np.concatenate([changed] + preds)
+
+        if V_prev is not None:
+            self.V = np.array(V_prev, dtype=self.dtype).reshape(self.env_size, self.env_size)
+        return self.run_value_iteration_prioritized(max_backups, terminal_value, seeds=seeds)
+
+    def run_value_iteration_multigrid(self, min_size=16, coarse_theta=1e-2, max_iterations=10_000,
+                                      terminal_value=0.0):
+        """
+        Experimental: coarse-to-fine batch value iteration, not a faster default. The map is coarsened 2x per level
+        (GridWorld.coarsen, discount gamma^2 per level) down to min_size; the coarsest level
+        is solved from zeros, and each level's V is prolonged (2x2 block copy) as the warm
+        start of the next finer level. Coarse levels stop at coarse_theta; the fine level
+        uses theta, so the result is the same V* as plain batch VI. There is no map class where
+        it reliably wins: warm-start error still decays only by gamma per fine sweep, and on
+        the default and random maps (256-512, gamma 0.9-0.999) it cost -4%..+14% fine-sweep
+        equivalents vs plain VI and was usually slower in wall time. Prefer
+        run_value_iteration_vectorized; `gridrl bench --solvers vi_batch vi_multigrid` compares.
+        level_sweeps records (size, sweeps) per level, coarsest first; backups totals all
+        levels. Returns the total cost in fine-sweep equivalents (backups / fine states).
+        """
+        envs, gammas = [self.env], [self.gamma]
+        while envs[-1].env_size > min_size:
+            envs.append(envs[-1].coarsen(2, step_weight=1.0 + gammas[-1]))
+            gammas.append(gammas[-1] ** 2)
+
+        self.level_sweeps = []
+        total_backups = 0
+        V = None
+        for level in range(len(envs) - 1, -1, -1):
+            env = envs[level]
+            if level == 0:
+                agent = self
+            else:
+                agent = ValueIterationAgent(env, gammas[level], max(coarse_theta, self.theta_threshold), self.dtype)
+                agent.instrument = self.instrument
+            if V is not None:  # prolong the coarser solution
+                n = env.env_size
+                agent.V = np.repeat(np.repeat(V, 2, axis=0), 2, axis=1)[:n, :n].copy()
+            sweeps = agent.run_value_iteration_vectorized(max_iterations, terminal_value)
+            self.level_sweeps.append((env.env_size, sweeps))
+            total_backups += agent.backups
+            # Goal blocks are pinned to terminal_value, but their open fine cells sit next to
+            # the goal: prolong the landing reward there instead
+            V = np.where(env.terminal_grid, env.reward, agent.V)
+
+        self.backups = total_backups
+        return total_backups / self.env.n_states
+
+    def run_value_iteration_cached(self, cache, max_iterations=10_000, terminal_value=0.0):
+        """
+        Batch value iteration through a SolveCache. An exact hit (same model, gamma, theta,
+        terminal value) loads V*, the greedy policy and the original sweep count without
+        solving (backups = 0). A miss warm-starts from the nearest cached V of the same model,
+        solves, and stores the result if it converged (a solve cut short by max_iterations
+        is not V*). Returns the number of sweeps.
+        """
+        from .solve_cache import model_key
+        mkey = model_key(self.env)
+        params = dict(solver="vi_batch", gamma=self.gamma, theta=self.theta_threshold,
+                      terminal_value=float(terminal_value))
+        if self.dtype != np.float64:  # float64 entries keep their original keys
+            params["dtype"] = self.dtype.str
+
+        hit = cache.get(self.env, params, mkey)
+        if hit is not None:
+            self.V = hit["V"].astype(self.dtype, copy=False)
+            self.pi_idx = hit["pi_idx"]
+            self.backups = 0
+            self.converged = True
+            return int(hit["sweeps"])
+
+        warm = cache.nearest(self.env, params, mkey)
+        if warm is not None:
+            self.V = warm.astype(self.dtype, copy=False)
+        sweeps = self.run_value_iteration_vectorized(max_iterations, terminal_value)
+        self.update_greedy_policy()
+        if self.converged:
+            cache.put(self.env, params, mkey, V=self.V, pi_idx=self.pi_idx, sweeps=sweeps, backups=self.backups)
+        return sweeps
+
+    # ----- greedy policy from current V -----
+    def update_greedy_policy(self):
+        """pi(s) = argmax_a Q(s,a) as one argmax over q_values(); goals are marked -1."""
+        pi = np.argmax(self.q_values(), axis=1)  # first max wins, as in calculate_max_value
+        pi[self.env.terminal_grid.ravel()] = -1
+        self.pi_idx = pi.reshape(self.env_size, self.env_size)
+
+    def print_policy(self, out=None):
+        """Greedy arrows; goal shown as ' G ', walls as ' # ' (downsampled on big grids)."""
+        print_policy_arrows(self.env, self.pi_idx, "Greedy Policy (arrows):", out)
+
+    def save_npy(self, prefix):
+        """Write V and the greedy policy to <prefix>.V.npy / <prefix>.pi.npy."""
+        return save_npy(prefix, self.V, self.pi_idx)
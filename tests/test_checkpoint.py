@@ -0,0 +1,77 @@
+# test_checkpoint.py
+# Crash / resume equivalence: a run interrupted after a checkpoint and restarted with the
+# same Checkpointer must end with exactly the tables of an uninterrupted run.
+
+import random
+
+import numpy as np
+import pytest
+
+from gridrl.checkpoint import Checkpointer
+from gridrl.gridworld import GridWorld, random_layout
+from gridrl.instrument import Instrumentation
+from gridrl.mc_agent import MCAgent
+from gridrl.value_iteration_agent import ValueIterationAgent
+
+EPISODES = 12_000
+
+class Crash(Exception):
+    pass
+
+def crash_after(n_events):
+    """Instrumentation that raises on its n-th event, standing in for a killed process."""
+    seen = [0]
+    def callback(event, info):
+        seen[0] += 1
+        if seen[0] == n_events:
+            raise Crash
+    return Instrumentation([callback], record=False)
+
+@pytest.mark.parametrize("kw, crash_at", [
+    ({}, 3500),
+    ({"batch_size": 200}, 37),
+    ({"batch_size": 200, "stop_tol": 0.5}, 23),
+    ({"stop_tol": 1.0}, 5100),
+    ({"n_workers": 2, "sync_interval": 1000}, 4),
+])
+def test_mc_control_resume(tmp_path, kw, crash_at):
+    env = GridWorld(5)
+    ref = MCAgent(env, seed=42)
+    ref.mc_control_epsilon_greedy(EPISODES, **kw)
+
+    crashed = MCAgent(env, seed=42)
+    crashed.instrument = crash_after(crash_at)
+    with pytest.raises(Crash):
+        crashed.mc_control_epsilon_greedy(EPISODES, checkpoint=Checkpointer(str(tmp_path), every=1000), **kw)
+
+    random.seed(7)  # the resumed run must not depend on global RNG state
+    resumed = MCAgent(env, seed=42)
+    ckpt = Checkpointer(str(tmp_path), every=1000)
+    resumed.mc_control_epsilon_greedy(EPISODES, checkpoint=ckpt, **kw)
+    np.testing.assert_array_equal(resumed.Q, ref.Q)
+    assert resumed.steps_ctrl == ref.steps_ctrl
+    assert resumed.episodes_ctrl == ref.episodes_ctrl
+    assert resumed.stop_info == ref.stop_info
+
+    done = MCAgent(env, seed=42)  # rerunning a finished run reloads its result
+    done.mc_control_epsilon_greedy(EPISODES, checkpoint=Checkpointer(str(tmp_path)), **kw)
+    np.testing.assert_array_equal(done.Q, ref.Q)
+
+def test_vi_batch_resume(tmp_path):
+    env = GridWorld.from_layout_codes(random_layout(100, seed=1))
+    ref = ValueIterationAgent(env)
+    sweeps = ref.run_value_iteration_vectorized()
+
+    crashed = ValueIterationAgent(env)
+    crashed.instrument = crash_after(sweeps // 2)
+    with pytest.raises(Crash):
+        crashed.run_value_iteration_vectorized(checkpoint=Checkpointer(str(tmp_path), every=25))
+
+    resumed = ValueIterationAgent(env)
+    resumed.instrument = Instrumentation()
+    assert resumed.run_value_iteration_vectorized(checkpoint=Checkpointer(str(tmp_path), every=25)) == sweeps
+    np.testing.assert_array_equal(resumed.V, ref.V)
+    assert 0 < len(resumed.instrument.sweeps) < sweeps  # it did pick up mid-run
+
+    with pytest.raises(ValueError):  # a checkpoint of a different run is refused
+        ValueIterationAgent(env, gamma=0.95).run_value_iteration_vectorized(checkpoint=Checkpointer(str(tmp_path)))
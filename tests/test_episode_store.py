@@ -0,0 +1,76 @@
+# test_episode_store.py
+# EpisodeStore reopen after a torn write: whatever an interrupted append left behind,
+# the reopened log holds exactly the complete episodes and keeps appending after them.
+
+import os
+
+import numpy as np
+import pytest
+
+from gridrl.episode_store import COLUMNS, OFFSET_DTYPE, EpisodeStore
+
+def episode(i):
+    n = 3 + i % 4
+    return np.arange(n) + i % 20, np.full(n, i % 4), np.full(n, -1.0 - i)
+
+def write_store(directory, n_episodes):
+    with EpisodeStore(directory, env_size=5) as st:
+        for i in range(n_episodes):
+            st.append(*episode(i))
+        return st.n_steps
+
+def replay(st):
+    eps = []
+    for states, actions, rewards, lengths in st.iter_chunks(7):
+        for b, n in enumerate(lengths):
+            eps.append((states[b, :n], actions[b, :n], rewards[b, :n]))
+    return eps
+
+def assert_episodes(st, n_episodes):
+    got = replay(st)
+    assert len(st) == len(got) == n_episodes
+    assert st.n_steps == sum(len(e[0]) for e in got)
+    for i, (s, a, r) in enumerate(got):
+        for x, y in zip((s, a, r), episode(i)):
+            np.testing.assert_array_equal(x, y)
+
+def grow(path, extra):
+    with open(path, "ab") as f:
+        f.write(extra)
+
+def test_column_tail_without_offset(tmp_path):
+    # Killed between the column writes and the offsets write
+    d = str(tmp_path)
+    write_store(d, 20)
+    for name, dt in COLUMNS.items():
+        grow(os.path.join(d, f"{name}.bin"), np.zeros(5, dtype=dt).tobytes())
+    st = EpisodeStore(d)
+    assert_episodes(st, 20)
+    st.append(*episode(20))
+    st.close()
+    assert_episodes(EpisodeStore(d), 21)
+
+def test_partial_offset_entry(tmp_path):
+    d = str(tmp_path)
+    write_store(d, 20)
+    grow(os.path.join(d, "offsets.bin"), b"\x01\x02\x03")
+    assert_episodes(EpisodeStore(d), 20)
+
+def test_offsets_past_shortest_column(tmp_path):
+    # A log whose offsets reached the disk before the last episode's rewards
+    d = str(tmp_path)
+    n_steps = write_store(d, 20)
+    last = len(episode(19)[0])
+    os.truncate(os.path.join(d, "rewards.bin"), (n_steps - 2) * np.dtype(COLUMNS["rewards"]).itemsize)
+    st = EpisodeStore(d)
+    assert_episodes(st, 19)
+    assert st.n_steps == n_steps - last
+    for name, dt in COLUMNS.items():
+        assert os.path.getsize(os.path.join(d, f"{name}.bin")) == st.n_steps * np.dtype(dt).itemsize
+    assert os.path.getsize(os.path.join(d, "offsets.bin")) == 19 * np.dtype(OFFSET_DTYPE).itemsize
+
+def test_env_size_checked_on_reopen(tmp_path):
+    d = str(tmp_path)
+    write_store(d, 1)
+    with pytest.raises(ValueError):
+        EpisodeStore(d, env_size=6)
@@ -0,0 +1,47 @@
+# test_scenarios.py
+# ScenarioBatch against one ValueIterationAgent solve per variant: V*, sweeps and policy
+# must be identical in both dtypes, serial and pool-parallel.
+
+import itertools
+
+import numpy as np
+import pytest
+
+from gridrl.gridworld import GridWorld, random_layout
+from gridrl.scenarios import ScenarioBatch
+from gridrl.value_iteration_agent import ValueIterationAgent
+
+GAMMAS = [0.5, 0.9, 0.95, 0.99]
+SUBSTITUTIONS = [{}, {-5.0: -12.0}, {-5.0: -1.0, 10.0: 20.0}, {-1.0: -2.0}]
+
+def variant_agent(env, rewards, gamma, dtype):
+    """Plain agent on env with the variant's landing rewards."""
+    N = env.env_size
+    env_k = GridWorld(N, reward=rewards.reshape(N, N), terminal_mask=env.terminal_grid,
+                      wall_mask=env.wall_grid)
+    agent = ValueIterationAgent(env_k, gamma, 1e-9, dtype)
+    sweeps = agent.run_value_iteration_vectorized()
+    agent.update_greedy_policy()
+    return agent, sweeps
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+@pytest.mark.parametrize("layout_seed", [None, 0, 1, 2])
+def test_batch_matches_per_variant_agent(dtype, layout_seed):
+    env = GridWorld(5) if layout_seed is None else GridWorld.from_layout_codes(random_layout(12, seed=layout_seed))
+    batch = ScenarioBatch.from_grid(env, GAMMAS, SUBSTITUTIONS, dtype=dtype)
+    batch.run_value_iteration()
+    batch.update_greedy_policy()
+    for k, (gamma, _) in enumerate(itertools.product(GAMMAS, SUBSTITUTIONS)):
+        agent, sweeps = variant_agent(env, batch.rewards[k], gamma, dtype)
+        assert batch.sweeps[k] == sweeps
+        np.testing.assert_array_equal(batch.V[k].ravel(), agent.V.ravel())
+        np.testing.assert_array_equal(batch.pi_idx[k].ravel(), agent.pi_idx.ravel())
+
+def test_pool_matches_serial():
+    env = GridWorld(5)
+    serial = ScenarioBatch.from_grid(env, GAMMAS, SUBSTITUTIONS)
+    serial.run_value_iteration()
+    pooled = ScenarioBatch.from_grid(env, GAMMAS, SUBSTITUTIONS)
+    pooled.run_value_iteration(n_workers=2)
+    np.testing.assert_array_equal(pooled.V, serial.V)
+    np.testing.assert_array_equal(pooled.sweeps, serial.sweeps)
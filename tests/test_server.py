@@ -0,0 +1,121 @@
+# test_server.py
+# EvalServer over a real socket: lookups against a direct solve, request coalescing,
+# error replies that leave the connection usable, LRU eviction / unload, map_dir
+# confinement and shared-memory attach in the server's own process.
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from gridrl.gridworld import GridWorld, random_layout
+from gridrl.server import EvalClient, EvalServer, attach_tables
+from gridrl.value_iteration_agent import ValueIterationAgent
+
+def serve(test, **server_kw):
+    """Run test(server, client) against a fresh server on a free port."""
+    async def main():
+        server = await EvalServer(**server_kw).start()
+        client = await EvalClient.connect(port=server.port)
+        try:
+            return await test(server, client)
+        finally:
+            await client.close()
+            await server.close()
+    return asyncio.run(main())
+
+def test_lookup_matches_agent():
+    agent = ValueIterationAgent(GridWorld(5), 0.9, 1e-9)
+    agent.run_value_iteration_vectorized()
+    agent.update_greedy_policy()
+
+    async def test(server, client):
+        states = np.arange(25)
+        flat = await client.lookup({"size": 5}, states)
+        pairs = await client.lookup({"size": 5}, np.stack([states // 5, states % 5], axis=1))
+        assert flat == pairs
+        np.testing.assert_array_equal(flat["values"], agent.V.ravel())
+        np.testing.assert_array_equal(flat["actions"], agent.pi_idx.ravel())
+        assert server.counts["solves"] == 1
+
+        V, pi, segments = attach_tables(await client.solve({"size": 5}))  # same process as the server
+        np.testing.assert_array_equal(V, agent.V)
+        np.testing.assert_array_equal(pi, agent.pi_idx)
+        del V, pi
+        for shm in segments:
+            shm.close()
+    serve(test)
+
+def test_concurrent_requests_coalesce():
+    async def test(server, client):
+        env = {"size": 60, "random": True, "seed": 3}
+        replies = await asyncio.gather(*(server.handle(dict(op="solve", env=env)) for _ in range(4)),
+                                       server.handle(dict(op="lookup", env=env, states=[0])))
+        assert len({r["V"]["name"] for r in replies[:4]}) == 1
+        assert server.counts["solves"] == 1
+        assert server.counts["coalesced"] == 4
+    serve(test)
+
+def test_errors_answer_the_request_only():
+    async def test(server, client):
+        bad = [dict(op="nope"), dict(op="solve", env={"colour": 1}), dict(op="solve", env={"size": 1}),
+               dict(op="lookup", env={"size": 5}, states=[25]), dict(op="lookup", env={"size": 5})]
+        for request in bad:
+            with pytest.raises(ValueError):
+                await client.request(**request)
+        client._writer.write(b"not json\n")
+        assert b"error" in await client._reader.readline()
+        assert (await client.lookup({"size": 5}, [24]))["actions"] == [-1]  # connection still usable
+        stats = await client.stats()
+        assert stats["errors"] == len(bad) + 1
+        assert stats["latency"]["invalid"]["count"] == 2
+    serve(test)
+
+def test_eof_raises_connection_error():
+    async def main():
+        async def hang_up(reader, writer):
+            writer.close()
+        srv = await asyncio.start_server(hang_up, "127.0.0.1", 0)
+        client = await EvalClient.connect(port=srv.sockets[0].getsockname()[1])
+        with pytest.raises(ConnectionError):
+            await client.stats()
+        client._writer.close()
+        srv.close()
+        await srv.wait_closed()
+    asyncio.run(main())
+
+def test_lru_eviction_and_unload():
+    async def test(server, client):
+        for size in (5, 6, 7):
+            await client.solve({"size": size})
+        await client.solve({"size": 6})  # now most recently used: 5 goes next
+        await client.solve({"size": 8})
+        stats = await client.stats()
+        assert stats["tables"] == 3 and stats["evictions"] == 1 and stats["solves"] == 4
+        await client.solve({"size": 6})
+        assert server.counts["solves"] == 4
+        await client.solve({"size": 5})
+        assert server.counts["solves"] == 5
+
+        assert (await client.unload({"size": 5}))["unloaded"] is True
+        assert (await client.unload({"size": 5}))["unloaded"] is False
+        assert len(server.tables) == 2
+    serve(test, max_tables=3)
+
+def test_map_files_confined_to_map_dir(tmp_path):
+    maps = tmp_path / "maps"
+    maps.mkdir()
+    np.save(maps / "m.npy", random_layout(4, seed=0))
+    np.save(tmp_path / "outside.npy", random_layout(4, seed=0))
+
+    async def test(server, client):
+        assert (await client.solve({"map": "m.npy"}))["shape"] == [4, 4]
+        for name in ("../outside.npy", str(tmp_path / "outside.npy")):
+            with pytest.raises(ValueError, match="outside the map directory"):
+                await client.solve({"map": name})
+    serve(test, map_dir=str(maps))
+
+    async def no_dir(server, client):
+        with pytest.raises(ValueError, match="no --map-dir"):
+            await client.solve({"map": "m.npy"})
+    serve(no_dir)